@@ -1,83 +1,179 @@
 # app/api/v1/endpoints/router.py
-from fastapi import BackgroundTasks
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import List, Optional
 import os
 import json
+import time
+import uuid
+import asyncio
+import hashlib
 from io import BytesIO
-from app.core.utils.unzip import unzip_file
+from app.core.utils.workspace import WorkspaceManager, WorkspaceQuotaError
+from app.core.utils.unzip import archive_root
 from app.core.config import Config
 from app.services.llm_model import LLMModel
 from app.core.logger import logger
 from app.core.utils.pdf_generator import generate_pdf_report
-from app.core.utils.code_analysis import format_project_tree
+from app.core.utils.snapshot import SnapshotStore, build_manifest, diff_manifests
+from app.core.analysis.static_checkers import process_pool, run_static_checks
+from app.services.rule_analysis import iter_rule_records
+from app.services.single_flight import SingleFlight
+from app.services.cancellation import AnalysisCancelled, CancellationToken, CLIENT_DISCONNECTED
+from app.services.batch_analysis import BatchProject, build_project_snapshot, discover_projects, run_rule_pairs
+from app.core.utils.json_report import (
+    BATCH_REPORT_SCHEMA,
+    JSON_REPORT_SCHEMA,
+    build_batch_report,
+    build_json_report,
+    rule_result,
+    summary,
+    to_ndjson
+)
 
 router = APIRouter()
 config = Config()
+snapshot_store = SnapshotStore(config.paths.snapshots_dir, config.snapshots.ttl_seconds, config.snapshots.max_count)
+workspace_manager = WorkspaceManager(config.workspace, config.paths.unzip_dir)
+analysis_jobs = SingleFlight(config.jobs.result_ttl_seconds)
+
+# pdf - отчет целиком, json - машиночитаемый отчет для CI,
+# ndjson - поток результатов по правилам и итоговая запись summary
+REPORT_FORMATS = ('pdf', 'json', 'ndjson')
 
 
 @router.post("/upload")
-async def upload_zip(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_zip(request: Request,
+                     file: UploadFile = File(...),
+                     base_snapshot: Optional[str] = Form(None),
+                     report_format: str = Form('pdf', alias='format')):
     logger.info(f"Получен файл: {file.filename}")
-    temp_dir = config.paths.unzip_dir
-    os.makedirs(temp_dir, exist_ok=True)
-    zip_path = os.path.join(temp_dir, file.filename)
 
-    # Сохраняем загруженный файл
-    try:
-        with open(zip_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        logger.info(f"Файл сохранен по пути: {zip_path}")
-    except Exception as e:
-        logger.error(f"Ошибка при сохранении файла: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка сервера при сохранении файла.")
+    if report_format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат отчета: {report_format}. "
+                                                    f"Допустимые значения: {', '.join(REPORT_FORMATS)}.")
 
-    # Разархивируем файл
-    extract_to = os.path.join(temp_dir, os.path.splitext(file.filename)[0])
-    try:
-        unzip_file(zip_path, extract_to)
-        logger.info(f"Файл разархивирован в: {extract_to}")
-    except Exception as e:
-        logger.error(f"Ошибка при разархивировании файла: {e}")
-        raise HTTPException(status_code=400, detail="Некорректный ZIP-файл.")
+    # Предыдущий снимок проекта для инкрементального анализа
+    previous_snapshot = None
+    if base_snapshot:
+        previous_snapshot = snapshot_store.load(base_snapshot)
+        if previous_snapshot is None:
+            raise HTTPException(status_code=404, detail=f"Снимок {base_snapshot} не найден.")
+        logger.info(f"Инкрементальный анализ относительно снимка {base_snapshot}")
 
-    # Устанавливаем project_root в конфигурации
-    config.set_project_root(extract_to)
+    rules_bytes, rules = load_rules()
+    version = analysis_version(rules_bytes)
 
-    # Инициализируем LLMModel без передачи project_root
-    llm_model = LLMModel(model_name=config.llm.model_name)
+    with workspace_manager.job() as workspace:
+        # Сохраняем загруженный файл
+        try:
+            upload_hash = await asyncio.to_thread(workspace_manager.save_upload, workspace, file.file)
+            logger.info(f"Файл сохранен по пути: {workspace.zip_path}")
+        except WorkspaceQuotaError as e:
+            logger.error(f"Превышена квота при сохранении файла: {e}")
+            raise quota_exceeded(e)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении файла: {e}")
+            raise HTTPException(status_code=500, detail="Ошибка сервера при сохранении файла.")
 
-    # Загрузка правил из rules.json
-    try:
-        with open(config.paths.rules, 'r', encoding='utf-8') as f:
-            rules = json.load(f)
-        logger.info("Правила загружены из rules.json.")
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке правил: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка сервера при загрузке правил.")
+        # Одинаковые запросы подключаются к уже выполняющемуся анализу
+        job_key = f"{upload_hash}:{version}:{base_snapshot or ''}"
+        job = analysis_jobs.get(job_key)
+        if job is not None:
+            logger.info(f"Запрос подключен к задаче анализа {job.snapshot_id} для того же архива.")
+        else:
+            # Задача держит ссылку на рабочий каталог до завершения, а успешная -
+            # пока ее результат хранится в кэше
+            workspace_manager.retain(workspace)
+            job = analysis_jobs.start(
+                job_key, uuid.uuid4().hex,
+                lambda job: prepare_analysis(job, workspace, rules, previous_snapshot, version),
+                on_finally=lambda: workspace_manager.release(workspace),
+                timeout=config.jobs.timeout_seconds
+            )
+
+        # Пока запрос подписан на задачу, она не отменяется из-за отключения клиентов
+        job.attach()
+        try:
+            await until_disconnected(request, job.wait_prepared())
+        except HTTPException:
+            job.detach()
+            raise
+        except AnalysisCancelled as e:
+            job.detach()
+            raise analysis_cancelled(e, job)
+        except Exception:
+            job.detach()
+            raise HTTPException(status_code=500, detail="Ошибка сервера при подготовке анализа.")
+
+    project_name = os.path.splitext(os.path.basename(file.filename))[0]
+
+    # Потоковая выдача: каждое правило отправляется клиенту сразу после проверки.
+    # При отключении клиента Starlette прерывает генератор, и подписка снимается.
+    # Итоговая запись summary отправляется всегда, в том числе при ошибке анализа,
+    # чтобы клиент мог отличить ее от обрыва соединения.
+    if report_format == 'ndjson':
+        async def stream_results():
+            rule_results = []
+            cancel_reason = None
+            error = None
+            try:
+                async for rule_id, record in job.stream():
+                    rule_results.append(rule_result(rule_id, record))
+                    yield to_ndjson(rule_results[-1])
+            except AnalysisCancelled as e:
+                cancel_reason = e.reason
+            except Exception as e:
+                logger.error(f"Ошибка при потоковой выдаче результатов анализа: {e!r}")
+                error = analysis_error(e)
+            finally:
+                job.detach()
+            yield to_ndjson(summary(project_name, job.snapshot_id, rule_results, job.duration,
+                                    len(rules), cancel_reason, error))
 
-    # Получение дерева проекта в виде строки
-    project_tree_str = format_project_tree()
+        return StreamingResponse(
+            stream_results(),
+            media_type="application/x-ndjson",
+            headers={"X-Snapshot-Id": job.snapshot_id}
+        )
 
-    # Инициализация списка для хранения результатов анализа
-    analysis_results = []
+    cancel_reason = None
+    error = None
+    try:
+        records = await until_disconnected(request, job.result())
+    except HTTPException:
+        raise
+    except AnalysisCancelled as e:
+        if report_format != 'json':
+            raise analysis_cancelled(e, job)
+        cancel_reason = e.reason
+        records = list(job.records)
+    except Exception as e:
+        logger.error(f"Ошибка при анализе проекта: {e!r}")
+        if report_format != 'json':
+            raise analysis_failed(e, job)
+        error = analysis_error(e)
+        records = list(job.records)
+    finally:
+        job.detach()
+    rule_results = [rule_result(rule_id, record) for rule_id, record in records]
 
-    # Обработка каждого правила
-    for rule_obj in rules:
-        rule = rule_obj['rule']
-        logger.info(f"Анализ правила: {rule}")
-        analysis_result = llm_model.analyze_rule(rule)
-        if analysis_result:
-            analysis_results.append(analysis_result)
+    if report_format == 'json':
+        # Прерванный или завершившийся ошибкой анализ возвращает частичный
+        # отчет со статусом cancelled или failed
+        report = build_json_report(project_name, job.snapshot_id, rule_results, job.duration,
+                                   len(rules), cancel_reason, error)
+        status_code = 500 if error else (504 if cancel_reason else 200)
+        return JSONResponse(report, status_code=status_code, headers={"X-Snapshot-Id": job.snapshot_id})
 
     # Проверяем, есть ли результаты анализа
+    analysis_results = [record['report'] for _, record in records if record['report']]
     if not analysis_results:
-        return {"detail": "Ошибок не обнаружено."}
+        return {"detail": "Ошибок не обнаружено.", "snapshot_id": job.snapshot_id}
 
     # Генерация PDF отчета на основе результатов анализа
     try:
-        pdf_bytes = generate_pdf_report('\n\n'.join(analysis_results))
+        pdf_bytes = await asyncio.to_thread(generate_pdf_report, '\n\n'.join(analysis_results))
         logger.info("PDF отчет успешно сгенерирован.")
     except Exception as e:
         logger.error(f"Ошибка при генерации PDF отчета: {e}")
@@ -87,22 +183,297 @@ async def upload_zip(background_tasks: BackgroundTasks, file: UploadFile = File(
     pdf_file = BytesIO(pdf_bytes)
     pdf_file.seek(0)
 
-    background_tasks.add_task(cleanup_temp_dirs, extract_to)
-
     return StreamingResponse(
         pdf_file,
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f"attachment; filename=report_{os.path.splitext(os.path.basename(file.filename))[0]}.pdf"}
+            "Content-Disposition": f"attachment; filename=report_{project_name}.pdf",
+            "X-Snapshot-Id": job.snapshot_id}
     )
 
 
-def cleanup_temp_dirs(path):
+async def prepare_analysis(job, workspace, rules, previous_snapshot, version):
+    """
+    Распаковывает архив, выполняет статические проверки и возвращает итератор
+    результатов правил. После последнего правила сохраняется снимок проекта.
+    """
+    # Разархивируем файл
     try:
-        if os.path.isfile(path):
-            os.remove(path)
-        elif os.path.isdir(path):
-            shutil.rmtree(path)
-        logger.info(f"Deleted: {path}")
+        extract_to = await asyncio.to_thread(workspace_manager.extract, workspace)
+        logger.info(f"Файл разархивирован в: {extract_to}")
+    except WorkspaceQuotaError as e:
+        logger.error(f"Превышена квота при разархивировании файла: {e}")
+        raise quota_exceeded(e)
     except Exception as e:
-        logger.error(f"Error deleting {path}: {e}")
+        logger.error(f"Ошибка при разархивировании файла: {e}")
+        raise HTTPException(status_code=400, detail="Некорректный ZIP-файл.")
+
+    job.cancel_token.check()
+
+    # Проверки уровня проекта (.gitignore, deployment, конфигурации) ищут файлы в корне проекта
+    project_root = archive_root(extract_to)
+
+    # Устанавливаем project_root в конфигурации
+    config.set_project_root(project_root)
+
+    llm_model = LLMModel(model_name=config.llm.model_name, project_root=project_root,
+                         cancel_token=job.cancel_token)
+
+    # Манифест файлов проекта и отличия от предыдущего снимка
+    manifest = await asyncio.to_thread(build_manifest, project_root)
+    diff = None
+    if previous_snapshot is not None:
+        diff = diff_manifests(previous_snapshot['manifest'], manifest)
+        logger.info(f"Отличия от снимка {previous_snapshot['id']}: {diff}")
+
+    job.cancel_token.check()
+
+    # Детерминированные проверки выполняются один раз для всех правил
+    static_results = await asyncio.to_thread(
+        run_static_checks, project_root, manifest, config.static.options(), config.static.workers
+    )
+
+    def records():
+        rule_records = {}
+        try:
+            for rule_id, record in iter_rule_records(rules, llm_model, static_results, project_root,
+                                                     config.static.max_findings,
+                                                     previous_snapshot=previous_snapshot, diff=diff,
+                                                     cancel_token=job.cancel_token, analysis_version=version):
+                rule_records[rule_id] = record
+                yield rule_id, record
+        finally:
+            # Снимок сохраняется и при прерванном анализе: его id уже отдан клиенту,
+            # а правила, которых в снимке нет, при следующем анализе проверяются заново
+            snapshot_store.save(job.snapshot_id, manifest, rule_records, version)
+
+    return records()
+
+
+@router.post("/batch")
+async def upload_batch(request: Request,
+                       files: List[UploadFile] = File(...),
+                       multi_project: bool = Form(False)):
+    """
+    Пакетный анализ нескольких проектов. Каждый архив - отдельный проект,
+    при multi_project=true отдельным проектом считается каждый каталог
+    верхнего уровня архива. Снимки проектов готовятся параллельно в пуле
+    процессов, затем все пары (правило, проект) проверяются с общим
+    ограничением одновременных вызовов модели. Возвращает JSON-отчеты
+    по проектам и общую сводку (см. /batch-report-schema).
+    """
+    started_at = time.monotonic()
+    logger.info(f"Получен пакет архивов: {[file.filename for file in files]}")
+    rules_bytes, rules = load_rules()
+    version = analysis_version(rules_bytes)
+
+    with workspace_manager.job() as workspace:
+        projects = []
+        names = set()
+        for index, file in enumerate(files):
+            zip_path = os.path.join(workspace.path, 'archives', f"{index}.zip")
+            extract_to = os.path.join(workspace.path, 'projects', str(index))
+            try:
+                await asyncio.to_thread(workspace_manager.save_upload, workspace, file.file, zip_path)
+                await asyncio.to_thread(workspace_manager.extract, workspace, zip_path, extract_to)
+            except WorkspaceQuotaError as e:
+                logger.error(f"Превышена квота при сохранении пакета: {e}")
+                raise quota_exceeded(e)
+            except Exception as e:
+                logger.error(f"Ошибка при разархивировании файла {file.filename}: {e}")
+                raise HTTPException(status_code=400, detail=f"Некорректный ZIP-файл: {file.filename}.")
+
+            archive_name = os.path.splitext(os.path.basename(file.filename))[0]
+            found = [(f"{archive_name}/{name}", root) for name, root in discover_projects(extract_to)] \
+                if multi_project else [(archive_name, archive_root(extract_to))]
+            for name, root in found:
+                unique_name = name
+                suffix = 2
+                while unique_name in names:
+                    unique_name = f"{name}-{suffix}"
+                    suffix += 1
+                names.add(unique_name)
+                projects.append(BatchProject(unique_name, root, uuid.uuid4().hex))
+
+        if not projects:
+            raise HTTPException(status_code=400, detail="В загруженных архивах не найдено проектов.")
+        if len(projects) > config.batch.max_projects:
+            raise HTTPException(status_code=400, detail=f"Слишком много проектов в пакете: {len(projects)}, "
+                                                        f"допустимо не более {config.batch.max_projects}.")
+
+        # Срок пакета отсчитывается с подготовки снимков
+        cancel_token = CancellationToken(config.batch.timeout_seconds)
+        cancel_reason = None
+
+        # Манифесты и статические проверки проектов готовятся параллельно в отдельных процессах
+        loop = asyncio.get_running_loop()
+        options = config.static.options()
+        pool = process_pool(max(1, min(config.batch.snapshot_workers, len(projects))))
+        snapshots = [None] * len(projects)
+        try:
+            snapshots = await until_disconnected(request, asyncio.gather(
+                *(loop.run_in_executor(pool, build_project_snapshot, project.root, options) for project in projects),
+                return_exceptions=True
+            ), cancel_token)
+        except AnalysisCancelled as e:
+            logger.warning(f"Пакетный анализ прерван при подготовке снимков ({e.reason}).")
+            cancel_reason = e.reason
+        finally:
+            # Не дожидаемся процессов в потоке событийного цикла: при прерывании
+            # оставшиеся проекты не запускаются, а начатые завершаются в фоне
+            pool.shutdown(wait=False, cancel_futures=True)
+        for project, snapshot in zip(projects, snapshots):
+            if isinstance(snapshot, Exception):
+                logger.error(f"Ошибка при подготовке проекта {project.name}: {snapshot!r}")
+                project.error = str(snapshot) or type(snapshot).__name__
+            elif snapshot is not None:
+                project.manifest, project.static_results = snapshot
+
+        if cancel_reason is None:
+            # Проверки продолжают работать с каталогом после отключения клиента,
+            # пока не заметят отмену, поэтому каталог освобождается по их завершении
+            workspace_manager.retain(workspace)
+            analysis = asyncio.ensure_future(asyncio.to_thread(
+                run_rule_pairs, projects, rules, config, cancel_token, version
+            ))
+            analysis.add_done_callback(lambda _: workspace_manager.release(workspace))
+
+            try:
+                await until_disconnected(request, asyncio.shield(analysis))
+            except HTTPException:
+                cancel_token.cancel(CLIENT_DISCONNECTED)
+                raise
+            except AnalysisCancelled as e:
+                logger.warning(f"Пакетный анализ прерван ({e.reason}).")
+                cancel_reason = e.reason
+            except Exception as e:
+                logger.error(f"Ошибка при пакетном анализе: {e!r}")
+                raise HTTPException(status_code=500, detail="Ошибка сервера при анализе проектов.")
+
+    reports = []
+    errors = []
+    for project in projects:
+        if project.error is not None:
+            errors.append({'project': project.name, 'error': project.error})
+            continue
+        rule_results = []
+        for index, rule_obj in enumerate(rules, start=1):
+            rule_id = str(rule_obj.get('id', index))
+            if rule_id in project.records:
+                rule_results.append(rule_result(rule_id, project.records[rule_id]))
+        errors.extend({'project': project.name, 'rule': rule_id, 'error': error}
+                      for rule_id, error in sorted(project.rule_errors.items()))
+        completed = len(rule_results) == len(rules)
+        # Проект, снимок которого не успел подготовиться, сохраняется с пустым
+        # манифестом: при следующем анализе все его файлы считаются новыми
+        await asyncio.to_thread(snapshot_store.save, project.snapshot_id, project.manifest or {},
+                                project.records, version)
+        reports.append(build_json_report(project.name, project.snapshot_id, rule_results,
+                                         rules_total=len(rules),
+                                         cancel_reason=None if completed else cancel_reason))
+
+    report = build_batch_report(reports, errors, time.monotonic() - started_at, cancel_reason)
+    return JSONResponse(report, status_code=504 if cancel_reason else 200)
+
+
+def load_rules():
+    """
+    Загружает правила из rules.json. Возвращает исходные байты файла
+    (для версии анализа) и разобранный список правил.
+    """
+    try:
+        with open(config.paths.rules, 'rb') as f:
+            rules_bytes = f.read()
+        rules = json.loads(rules_bytes)
+        logger.info("Правила загружены из rules.json.")
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке правил: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка сервера при загрузке правил.")
+    return rules_bytes, rules
+
+
+def analysis_version(rules_bytes):
+    """
+    Версия анализа: правила, промпты, модель и параметры проверок. Одинаковые
+    архивы объединяются только при совпадении версии.
+    """
+    digest = hashlib.sha256(rules_bytes)
+    prompts_dir = os.path.join('app', 'llm_prompts')
+    for filename in sorted(os.listdir(prompts_dir)):
+        if filename.endswith('.txt'):
+            with open(os.path.join(prompts_dir, filename), 'rb') as f:
+                digest.update(f.read())
+    digest.update(config.llm.model_name.encode('utf-8'))
+    digest.update(json.dumps(config.static.options(), sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(vars(config.retrieval), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+@router.get("/report-schema")
+async def report_schema():
+    """JSON Schema отчета, возвращаемого при format=json."""
+    return JSON_REPORT_SCHEMA
+
+
+@router.get("/batch-report-schema")
+async def batch_report_schema():
+    """JSON Schema отчета пакетного анализа."""
+    return BATCH_REPORT_SCHEMA
+
+
+async def until_disconnected(request, awaitable, cancel_token=None):
+    """
+    Дожидается awaitable, периодически проверяя, подключен ли еще клиент.
+    Если клиент отключился, ожидание прекращается с кодом 499. Если передан
+    cancel_token, при его отмене (в том числе по сроку) ожидание прекращается
+    с AnalysisCancelled.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.jobs.disconnect_poll_seconds)
+            if done:
+                return task.result()
+            if cancel_token is not None:
+                cancel_token.check()
+            if await request.is_disconnected():
+                logger.info("Клиент отключился, не дождавшись результата анализа.")
+                raise HTTPException(status_code=499, detail="Клиент отключился.")
+    finally:
+        task.cancel()
+
+
+def analysis_cancelled(error, job):
+    """
+    Ответ на прерванный анализ: причина и список правил, проверка которых
+    успела завершиться.
+    """
+    status_code = 499 if error.reason == CLIENT_DISCONNECTED else 504
+    return HTTPException(status_code=status_code, detail={
+        "message": "Анализ прерван: превышено время выполнения." if status_code == 504
+        else "Анализ прерван: клиент отключился.",
+        "reason": error.reason,
+        "completed_rules": job.completed_rules,
+    })
+
+
+def analysis_error(error):
+    """Текст ошибки анализа для поля error итоговой записи отчета."""
+    return f"{type(error).__name__}: {error}"
+
+
+def analysis_failed(error, job):
+    """
+    Ответ на анализ, завершившийся ошибкой: текст ошибки и список правил,
+    проверка которых успела завершиться.
+    """
+    return HTTPException(status_code=500, detail={
+        "message": "Ошибка сервера при анализе проекта.",
+        "error": analysis_error(error),
+        "completed_rules": job.completed_rules,
+    })
+
+
+def quota_exceeded(error):
+    status_code = 413 if error.per_job else 507
+    return HTTPException(status_code=status_code, detail=str(error))
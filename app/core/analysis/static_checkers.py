@@ -0,0 +1,353 @@
+# app/core/analysis/static_checkers.py
+
+import ast
+import os
+import re
+import logging
+import configparser
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.analysis.tree_parser import parse_project_tree, check_structure
+from app.core.utils.lru_cache import LRUCache
+from app.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+PASSED = 'passed'
+FAILED = 'failed'
+AMBIGUOUS = 'ambiguous'
+
+TEST_NAME_PATTERN = re.compile(r'^test__[A-Za-z0-9]\w*?__\w+$')
+THIRD_PARTY_LOGGERS = {'loguru'}
+
+# Проверки, выполняемые для каждого Python-файла в пуле процессов
+FILE_CHECKERS = ('no_print', 'logging_usage', 'test_naming', 'size', 'docstrings', 'line_length')
+# Проверки, выполняемые один раз для всего проекта
+PROJECT_CHECKERS = ('pep8', 'formatter_configs', 'required_files', 'deployment_dir', 'tests_present')
+
+CHECKER_TITLES = {
+    'no_print': "Использование print в основном коде",
+    'logging_usage': "Логирование не через стандартный модуль logging",
+    'test_naming': "Имена тестов не соответствуют шаблону test__<class_name>__<case>",
+    'size': "Слишком большие модули, классы или методы",
+    'docstrings': "Отсутствуют докстринги (PEP257)",
+    'line_length': "Строки длиннее допустимого",
+    'pep8': "Код не соответствует PEP8",
+    'formatter_configs': "Отсутствуют конфигурации yapf и isort",
+    'required_files': "Отсутствуют обязательные файлы в корне проекта",
+    'deployment_dir': "Отсутствует каталог deployment с файлами CI/CD",
+    'tests_present': "Отсутствуют тесты",
+}
+
+# Результаты проверки файлов по хэшу содержимого и параметрам проверки
+_file_results_cache = LRUCache(Config().cache.static_results_max_items)
+
+
+def process_pool(max_workers):
+    """
+    Пул процессов для статических проверок. Пул создается из сервера, в
+    котором другие потоки могут удерживать блокировки кэшей; процесс,
+    полученный через fork, унаследовал бы захваченную блокировку навсегда,
+    поэтому процессы запускаются через forkserver (spawn, где он недоступен).
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+
+def is_test_file(relative_path):
+    parts = relative_path.split('/')
+    name = parts[-1]
+    return (name.startswith('test_') or name.endswith('_test.py') or name == 'conftest.py'
+            or any(part in ('tests', 'test') for part in parts[:-1]))
+
+
+def _finding(path, line, message):
+    return {'path': path, 'line': line, 'message': message}
+
+
+class _FileVisitor(ast.NodeVisitor):
+    def __init__(self, path, options, is_test):
+        self.path = path
+        self.options = options
+        self.is_test = is_test
+        self.findings = {name: [] for name in FILE_CHECKERS}
+        self.parents = []
+
+    def _add(self, checker, node, message):
+        self.findings[checker].append(_finding(self.path, getattr(node, 'lineno', 1), message))
+
+    def _check_size(self, node, kind, limit):
+        length = node.end_lineno - node.lineno + 1
+        if length > limit:
+            self._add('size', node, f"{kind} {node.name} занимает {length} строк (максимум {limit})")
+
+    def _check_docstring(self, node, kind):
+        # Проверяются только функции и классы модуля и методы классов
+        if self.is_test or node.name.startswith('_'):
+            return
+        if self.parents and not isinstance(self.parents[-1], ast.ClassDef):
+            return
+        if ast.get_docstring(node) is None:
+            self._add('docstrings', node, f"{kind} {node.name} без докстринга")
+
+    def visit_Call(self, node):
+        func = node.func
+        if not self.is_test:
+            if isinstance(func, ast.Name) and func.id == 'print':
+                self._add('no_print', node, "Вызов print вместо logging")
+            elif (isinstance(func, ast.Attribute) and func.attr == 'write'
+                  and isinstance(func.value, ast.Attribute) and func.value.attr in ('stdout', 'stderr')
+                  and isinstance(func.value.value, ast.Name) and func.value.value.id == 'sys'):
+                self._add('logging_usage', node, f"Вывод через sys.{func.value.attr}.write вместо logging")
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        if not self.is_test:
+            for alias in node.names:
+                if alias.name.split('.')[0] in THIRD_PARTY_LOGGERS:
+                    self._add('logging_usage', node, f"Используется {alias.name} вместо logging")
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if not self.is_test and node.module and node.module.split('.')[0] in THIRD_PARTY_LOGGERS:
+            self._add('logging_usage', node, f"Используется {node.module} вместо logging")
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node):
+        self._check_size(node, "Класс", self.options['max_class_lines'])
+        self._check_docstring(node, "Класс")
+        self.parents.append(node)
+        self.generic_visit(node)
+        self.parents.pop()
+
+    def visit_FunctionDef(self, node):
+        self._check_size(node, "Функция", self.options['max_function_lines'])
+        if self.is_test and node.name.startswith('test') and not TEST_NAME_PATTERN.match(node.name):
+            self._add('test_naming', node, f"Тест {node.name} не соответствует шаблону test__<class_name>__<case>")
+        self._check_docstring(node, "Функция")
+        self.parents.append(node)
+        self.generic_visit(node)
+        self.parents.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def check_python_file(root, relative_path, options):
+    """
+    Выполняет все пофайловые проверки для одного Python-файла.
+    Если файл не удается разобрать, в результате заполняется поле error.
+    """
+    result = {'path': relative_path, 'error': None, 'findings': {name: [] for name in FILE_CHECKERS}}
+    try:
+        with open(os.path.join(root, relative_path), 'r', encoding='utf-8') as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        result['error'] = f"Не удалось прочитать файл: {e}"
+        return result
+
+    lines = source.splitlines()
+    for line_number, line in enumerate(lines, start=1):
+        if len(line) > options['max_line_length']:
+            result['findings']['line_length'].append(_finding(
+                relative_path, line_number,
+                f"Длина строки {len(line)} превышает {options['max_line_length']} символов"))
+
+    try:
+        tree = ast.parse(source, filename=relative_path)
+    except SyntaxError as e:
+        result['error'] = f"Синтаксическая ошибка в строке {e.lineno}: {e.msg}"
+        return result
+
+    visitor = _FileVisitor(relative_path, options, is_test_file(relative_path))
+    if len(lines) > options['max_module_lines']:
+        visitor.findings['size'].append(_finding(
+            relative_path, 1, f"Модуль занимает {len(lines)} строк (максимум {options['max_module_lines']})"))
+    if not visitor.is_test and lines and ast.get_docstring(tree) is None:
+        visitor.findings['docstrings'].append(_finding(relative_path, 1, "Модуль без докстринга"))
+    visitor.visit(tree)
+    for name, findings in visitor.findings.items():
+        result['findings'][name].extend(findings)
+    return result
+
+
+def _check_python_file_task(args):
+    return check_python_file(*args)
+
+
+def _check_pep8(root):
+    from app.core.utils.code_analysis import collect_pep8_errors
+
+    findings = []
+    for path, row, col, code, text in collect_pep8_errors(root):
+        if code == 'E501':
+            # Длина строк проверяется отдельно с лимитом из стандарта
+            continue
+        relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+        findings.append(_finding(relative_path, row, f"{code}: {text} (столбец {col})"))
+    return findings
+
+
+def _has_section(root, filename, sections):
+    path = os.path.join(root, filename)
+    if not os.path.isfile(path):
+        return False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return False
+    if filename.endswith('.cfg'):
+        parser = configparser.ConfigParser()
+        try:
+            parser.read_string(content)
+        except configparser.Error:
+            return False
+        return any(parser.has_section(section) for section in sections)
+    return any(f"[{section}]" in content for section in sections)
+
+
+def _check_formatter_configs(root):
+    findings = []
+    has_yapf = (os.path.isfile(os.path.join(root, '.style.yapf'))
+                or _has_section(root, 'setup.cfg', ['yapf'])
+                or _has_section(root, 'pyproject.toml', ['tool.yapf']))
+    has_isort = (os.path.isfile(os.path.join(root, '.isort.cfg'))
+                 or _has_section(root, 'setup.cfg', ['isort', 'tool:isort'])
+                 or _has_section(root, 'pyproject.toml', ['tool.isort']))
+    if not has_yapf:
+        findings.append(_finding('.style.yapf', None, "Не найдена конфигурация yapf"))
+    if not has_isort:
+        findings.append(_finding('.isort.cfg', None, "Не найдена конфигурация isort"))
+    return findings
+
+
+def _run_project_checks(root, manifest, options):
+    project_tree = parse_project_tree(root)
+    results = {}
+    try:
+        findings = _check_pep8(root)
+        results['pep8'] = {'status': FAILED if findings else PASSED, 'findings': findings}
+    except Exception as e:
+        logger.error(f"Не удалось выполнить flake8: {e}")
+        results['pep8'] = {'status': AMBIGUOUS, 'findings': []}
+
+    findings = _check_formatter_configs(root)
+    results['formatter_configs'] = {'status': FAILED if findings else PASSED, 'findings': findings}
+
+    findings = [_finding(v['path'], None, v['message'])
+                for v in check_structure(project_tree, {'files': options['required_files']})]
+    results['required_files'] = {'status': FAILED if findings else PASSED, 'findings': findings}
+
+    findings = [_finding(v['path'], None, v['message'])
+                for v in check_structure(project_tree, {'directories': options['required_dirs']})]
+    results['deployment_dir'] = {'status': FAILED if findings else PASSED, 'findings': findings}
+
+    has_tests = any(path.endswith('.py') and is_test_file(path) for path in manifest)
+    findings = [] if has_tests else [_finding('tests', None, "В проекте не найдено ни одного теста")]
+    results['tests_present'] = {'status': FAILED if findings else PASSED, 'findings': findings}
+    return results
+
+
+def run_static_checks(root, manifest, options, workers=None):
+    """
+    Запускает все детерминированные проверки проекта.
+
+    manifest: словарь путь -> хэш содержимого (см. app.core.utils.snapshot.build_manifest),
+    по хэшу переиспользуются результаты уже проверенных файлов.
+    Возвращает словарь: имя проверки -> {'status', 'findings'}.
+    """
+    options_key = tuple(sorted((k, v) for k, v in options.items() if not isinstance(v, list)))
+    python_files = sorted(path for path in manifest if path.endswith('.py'))
+    file_results = {}
+    uncached = []
+    for path in python_files:
+        cached = _file_results_cache.get((manifest[path], options_key))
+        if cached is not None:
+            file_results[path] = dict(cached, path=path, findings={
+                name: [dict(f, path=path) for f in findings] for name, findings in cached['findings'].items()
+            })
+        else:
+            uncached.append(path)
+
+    logger.info(f"Статический анализ: {len(uncached)} из {len(python_files)} файлов требуют проверки.")
+    tasks = [(root, path, options) for path in uncached]
+    if workers and workers > 1 and len(tasks) >= 2 * workers:
+        with process_pool(workers) as executor:
+            checked = list(executor.map(_check_python_file_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        checked = [_check_python_file_task(task) for task in tasks]
+    for result in checked:
+        file_results[result['path']] = result
+        _file_results_cache[(manifest[result['path']], options_key)] = result
+
+    results = {}
+    parse_errors = [result for result in file_results.values() if result['error']]
+    for error in parse_errors:
+        logger.warning(f"Статический анализ файла {error['path']} невозможен: {error['error']}")
+    for name in FILE_CHECKERS:
+        findings = [f for path in python_files for f in file_results[path]['findings'][name]]
+        if findings:
+            status = FAILED
+        elif parse_errors and name != 'line_length':
+            status = AMBIGUOUS
+        else:
+            status = PASSED
+        results[name] = {'status': status, 'findings': findings}
+
+    results.update(_run_project_checks(root, manifest, options))
+    return results
+
+
+def _read_line(root, path, line, cache):
+    if path not in cache:
+        try:
+            with open(os.path.join(root, path), 'r', encoding='utf-8') as f:
+                cache[path] = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            cache[path] = []
+    lines = cache[path]
+    return lines[line - 1] if line and 0 < line <= len(lines) else None
+
+
+def format_findings(checker, findings, root, max_findings=10):
+    """
+    Форматирует найденные нарушения в Markdown в стиле отчета второй модели.
+    """
+    output = [f"### {CHECKER_TITLES.get(checker, checker)}"]
+    lines_cache = {}
+    for finding in findings[:max_findings]:
+        location = f"{finding['path']} (Строка {finding['line']})" if finding['line'] else finding['path']
+        entry = f"{location}  {finding['message']}"
+        code_line = _read_line(root, finding['path'], finding['line'], lines_cache)
+        if code_line is not None:
+            entry += f"\n```\n{finding['line']}\t{code_line.rstrip()}\n```"
+        output.append(entry)
+    if len(findings) > max_findings:
+        output.append(f"*...Найдено нарушений: {len(findings)}, вывод сокращен...*")
+    return '\n\n'.join(output)
+
+
+def evaluate_rule(rule_obj, static_results, root, max_findings=10):
+    """
+    Собирает результат детерминированных проверок, сопоставленных правилу
+    (поле checkers в rules.json). Возвращает None, если у правила нет проверок.
+    """
+    checkers = [name for name in rule_obj.get('checkers', []) if name in static_results]
+    if not checkers:
+        return None
+    statuses = {name: static_results[name]['status'] for name in checkers}
+    failed = [name for name in checkers if statuses[name] == FAILED]
+    findings = [dict(f, checker=name) for name in failed for f in static_results[name]['findings']]
+    report = None
+    if failed:
+        report = '\n\n'.join(
+            format_findings(name, static_results[name]['findings'], root, max_findings) for name in failed
+        )
+    return {
+        'checkers': statuses,
+        'status': FAILED if failed else (AMBIGUOUS if AMBIGUOUS in statuses.values() else PASSED),
+        'ambiguous': AMBIGUOUS in statuses.values(),
+        'findings': findings,
+        'report': report,
+    }
@@ -20,5 +20,32 @@ def parse_project_tree(root_dir):
 
 
 def check_structure(project_tree, requirements):
-    # Реализовать проверку структуры проекта на соответствие требованиям
-    pass
+    """
+    Проверяет структуру проекта на соответствие требованиям.
+
+    requirements: словарь вида {'files': [...], 'directories': [...]} с путями
+    относительно корня проекта, которые обязаны существовать.
+    Возвращает список нарушений в виде словарей {'path', 'message'}.
+    """
+    violations = []
+    for required_file in requirements.get('files', []):
+        parent, name = os.path.split(os.path.normpath(required_file))
+        node = project_tree.get(parent or '.')
+        if node is None or name not in node['files']:
+            violations.append({
+                'path': required_file,
+                'message': f"Отсутствует обязательный файл {required_file}",
+            })
+    for required_dir in requirements.get('directories', []):
+        node = project_tree.get(os.path.normpath(required_dir))
+        if node is None:
+            violations.append({
+                'path': required_dir,
+                'message': f"Отсутствует обязательный каталог {required_dir}",
+            })
+        elif not node['files'] and not node['directories']:
+            violations.append({
+                'path': required_dir,
+                'message': f"Каталог {required_dir} пуст",
+            })
+    return violations
@@ -7,6 +7,8 @@ from pathlib import Path
 class LLMConfig:
     def __init__(self, config):
         self.model_name = config.get('model_name', 'ollama')
+        # Максимальная длительность одного вызова модели
+        self.call_timeout_seconds = config.get('call_timeout_seconds', 300)
 
 
 class PathsConfig:
@@ -16,6 +18,7 @@ class PathsConfig:
         self.errors_list = config.get('errors_list', 'app/llm_prompts/errors_list.json')
         self.rules = config.get('rules', 'app/llm_prompts/rules.json')
         self.logs = config.get('logs', 'logs/app.log')
+        self.snapshots_dir = config.get('snapshots_dir', 'snapshots')
         self.project_root = config.get('project_root', None)
         print("бля")
 
@@ -34,6 +37,93 @@ class PDFConfig:
         self.wkhtmltopdf_path = config.get('pdf', None)
 
 
+class StaticConfig:
+    def __init__(self, config):
+        self.workers = config.get('workers', 4)
+        self.max_line_length = config.get('max_line_length', 80)
+        self.max_module_lines = config.get('max_module_lines', 500)
+        self.max_class_lines = config.get('max_class_lines', 300)
+        self.max_function_lines = config.get('max_function_lines', 50)
+        self.max_findings = config.get('max_findings', 10)
+        self.required_files = config.get('required_files', ['.gitignore', '.editorconfig', '.gitattributes'])
+        self.required_dirs = config.get('required_dirs', ['deployment'])
+
+    def options(self):
+        """Параметры проверок, передаваемые в процессы статического анализа."""
+        return {
+            'max_line_length': self.max_line_length,
+            'max_module_lines': self.max_module_lines,
+            'max_class_lines': self.max_class_lines,
+            'max_function_lines': self.max_function_lines,
+            'required_files': self.required_files,
+            'required_dirs': self.required_dirs,
+        }
+
+
+class RetrievalConfig:
+    def __init__(self, config):
+        self.embedder = config.get('embedder', 'ollama')
+        self.embedding_model = config.get('embedding_model', 'nomic-embed-text')
+        self.hashing_dim = config.get('hashing_dim', 512)
+        self.alpha = config.get('alpha', 0.5)
+        self.max_chunk_lines = config.get('max_chunk_lines', 80)
+        self.file_types = config.get('file_types', ['.py', '.txt', '.md', '.html', '.js', '.css'])
+
+
+class ToolsConfig:
+    def __init__(self, config):
+        # Общий лимит вывода одного вызова file_content
+        self.max_total_lines = config.get('max_total_lines', 2000)
+        self.max_total_bytes = config.get('max_total_bytes', 200000)
+
+
+class WorkspaceConfig:
+    def __init__(self, config):
+        self.use_tmpfs = config.get('use_tmpfs', False)
+        self.tmpfs_dir = config.get('tmpfs_dir', '/dev/shm')
+        self.max_total_bytes = config.get('max_total_bytes', 10 * 1024 ** 3)  # 10 GB
+        self.max_job_bytes = config.get('max_job_bytes', 1024 ** 3)  # 1 GB
+        self.ttl_seconds = config.get('ttl_seconds', 3600)
+        self.max_age_seconds = config.get('max_age_seconds', 6 * 3600)
+        self.gc_interval_seconds = config.get('gc_interval_seconds', 300)
+
+
+class CacheConfig:
+    def __init__(self, config):
+        # Максимальное число записей в кэшах по хэшу содержимого
+        self.vectors_max_items = config.get('vectors_max_items', 50000)
+        self.tokens_max_items = config.get('tokens_max_items', 20000)
+        self.lint_max_items = config.get('lint_max_items', 20000)
+        self.static_results_max_items = config.get('static_results_max_items', 20000)
+
+
+class SnapshotsConfig:
+    def __init__(self, config):
+        # Снимки, которые давно не использовались как base_snapshot, удаляются
+        self.ttl_seconds = config.get('ttl_seconds', 30 * 24 * 3600)
+        self.max_count = config.get('max_count', 1000)
+
+
+class JobsConfig:
+    def __init__(self, config):
+        # Сколько секунд готовый результат отдается повторным одинаковым запросам
+        self.result_ttl_seconds = config.get('result_ttl_seconds', 120)
+        # Максимальная длительность задачи анализа, после нее задача прерывается
+        self.timeout_seconds = config.get('timeout_seconds', 1800)
+        # Как часто проверяется, не отключился ли клиент, ожидающий отчет
+        self.disconnect_poll_seconds = config.get('disconnect_poll_seconds', 1.0)
+
+
+class BatchConfig:
+    def __init__(self, config):
+        self.max_projects = config.get('max_projects', 50)
+        # Процессы для параллельной подготовки снимков проектов (манифест и статические проверки)
+        self.snapshot_workers = config.get('snapshot_workers', 4)
+        # Одновременные вызовы модели, обычно равно OLLAMA_NUM_PARALLEL
+        self.llm_concurrency = config.get('llm_concurrency', 2)
+        self.timeout_seconds = config.get('timeout_seconds', 7200)
+
+
 class Config:
     def __init__(self, config_file='config.toml'):
         # Get the directory where this config.py resides
@@ -48,6 +138,14 @@ class Config:
         self.paths = PathsConfig(self.config.get('paths', {}))
         self.logging = LoggingConfig(self.config.get('logging', {}))
         self.pdf = PDFConfig(self.config.get('pdf', {}))
+        self.static = StaticConfig(self.config.get('static', {}))
+        self.retrieval = RetrievalConfig(self.config.get('retrieval', {}))
+        self.tools = ToolsConfig(self.config.get('tools', {}))
+        self.workspace = WorkspaceConfig(self.config.get('workspace', {}))
+        self.cache = CacheConfig(self.config.get('cache', {}))
+        self.snapshots = SnapshotsConfig(self.config.get('snapshots', {}))
+        self.jobs = JobsConfig(self.config.get('jobs', {}))
+        self.batch = BatchConfig(self.config.get('batch', {}))
 
     def get(self, section, key, default=None):
         """Получение значения из конфигурации по секции и ключу."""
@@ -1,8 +1,12 @@
 import os
 import json
+import hashlib
 import subprocess
 from app.core.logger import logger
 from app.core.config import Config
+from app.core.utils.file_access import FileAccessor, ReadBudget
+from app.core.utils.snapshot import EXCLUDED_DIRS, file_sha256
+from app.core.utils.lru_cache import LRUCache
 from rank_bm25 import BM25Okapi
 import nltk
 from nltk.tokenize import word_tokenize
@@ -23,55 +27,80 @@ config = Config()
 project_root = config.paths.project_root
 logger.info(f'Project root!: {project_root}')
 
+# Кэши по хэшу содержимого файла: при повторном анализе почти не изменившегося
+# проекта токенизация и flake8 выполняются только для измененных файлов.
+_tokens_cache = LRUCache(config.cache.tokens_max_items)
+_lint_cache = LRUCache(config.cache.lint_max_items)
 
-def get_file_content_with_line_numbers(paths, extension_filter=None, max_lines_per_file=100):
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def tokenize_document(content):
+    key = content_hash(content)
+    tokens = _tokens_cache.get(key)
+    if tokens is None:
+        tokens = word_tokenize(content, language='english')
+        tokens = [word.lower() for word in tokens if word.isalnum()]
+        _tokens_cache[key] = tokens
+    return tokens
+
+
+def get_file_content_with_line_numbers(paths, extension_filter=None, max_lines_per_file=100, root=None,
+                                       start_line=None, end_line=None, symbol=None,
+                                       max_total_lines=None, max_total_bytes=None, accessor=None):
     """
     Получить содержимое файлов по заданным путям с нумерацией строк и форматированием в Markdown.
+
+    Можно запросить диапазон строк (start_line, end_line) или символ ("class Foo",
+    "def bar", "Foo.bar"). Общий объем вывода ограничивается max_total_lines и
+    max_total_bytes. accessor - FileAccessor снимка, чтобы индексы строк
+    строились один раз на файл.
     """
+    root = root or project_root
+    accessor = accessor or FileAccessor(root)
+    budget = ReadBudget(max_total_lines, max_total_bytes)
     output = []
     for path in paths:
-        full_path = os.path.join(project_root, path)
+        full_path = os.path.join(root, path)
         if os.path.isfile(full_path):
             if extension_filter and not full_path.endswith(extension_filter):
                 continue
-            content = read_file_with_line_numbers(full_path, max_lines_per_file)
-            if content:
-                output.append(f"### {path}\n{content}")
+            file_paths = [os.path.relpath(full_path, root)]
         elif os.path.isdir(full_path):
-            for root, _, files in os.walk(full_path):
-                for file in files:
+            file_paths = []
+            for dirpath, dirs, files in os.walk(full_path):
+                dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+                for file in sorted(files):
                     if extension_filter and not file.endswith(extension_filter):
                         continue
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, project_root)
-                    content = read_file_with_line_numbers(file_path, max_lines_per_file)
-                    if content:
-                        output.append(f"### {relative_path}\n{content}")
-    return '\n\n'.join(output)
-
+                    file_paths.append(os.path.relpath(os.path.join(dirpath, file), root))
+        else:
+            continue
 
-def read_file_with_line_numbers(file_path, max_lines):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            if len(lines) > max_lines:
-                lines = lines[:max_lines]
-                truncated = True
-            else:
-                truncated = False
-            numbered_lines = [f"{idx+1}\t{line.rstrip()}" for idx, line in enumerate(lines)]
-            content = '\n'.join(numbered_lines)
-            if truncated:
-                content += "\n\n*...Дальше слишком много строк, вывод сокращен...*"
-            return f"```\n{content}\n```"
-    except Exception as e:
-        logger.warning(f"Не удалось прочитать файл {file_path}: {e}")
-        return None
+        for relative_path in file_paths:
+            if budget.exhausted:
+                output.append("*...Достигнут лимит объема вывода, запросите оставшиеся файлы отдельно...*")
+                return '\n\n'.join(output)
+            content = accessor.read_numbered(relative_path, start_line, end_line, symbol,
+                                             max_lines_per_file, budget)
+            if content:
+                output.append(f"### {relative_path}\n{content}")
+            elif symbol and os.path.isfile(full_path):
+                output.append(f"### {relative_path}\nСимвол {symbol} не найден.")
+    return '\n\n'.join(output)
 
 
-def search_in_files(terms, max_results=5, file_types=None):
+def search_in_files(terms, max_results=5, file_types=None, root=None, matched_paths=None):
+    """
+    Поиск терминов в файлах проекта (BM25 + поиск подстроки).
+    Если передан matched_paths, в него добавляются пути файлов, попавших в вывод.
+    """
     from collections import defaultdict
 
+    root = root or project_root
+
     results = defaultdict(list)
     excluded_dirs = {'.venv', 'venv', '__pycache__'}
 
@@ -80,13 +109,13 @@ def search_in_files(terms, max_results=5, file_types=None):
 
     documents = []
 
-    for root, dirs, files in os.walk(project_root):
+    for dirpath, dirs, files in os.walk(root):
         dirs[:] = [d for d in dirs if d not in excluded_dirs]
         for file in files:
             if not any(file.endswith(ext) for ext in file_types):
                 continue
-            file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(file_path, project_root)
+            file_path = os.path.join(dirpath, file)
+            relative_path = os.path.relpath(file_path, root)
             mime_type, _ = mimetypes.guess_type(file_path)
             if not mime_type or not mime_type.startswith('text'):
                 continue  # Пропускаем нетекстовые файлы
@@ -107,11 +136,7 @@ def search_in_files(terms, max_results=5, file_types=None):
     if not documents:
         return "Нет доступных файлов для поиска."
 
-    corpus = []
-    for doc in documents:
-        tokens = word_tokenize(doc['content'], language='english')
-        tokens = [word.lower() for word in tokens if word.isalnum()]
-        corpus.append(tokens)
+    corpus = [tokenize_document(doc['content']) for doc in documents]
 
     bm25 = BM25Okapi(corpus)
 
@@ -142,6 +167,8 @@ def search_in_files(terms, max_results=5, file_types=None):
                     snippet = '\n'.join(numbered_context)
                     result = f"#### {path}\n```\n{snippet}\n```"
                     term_results.append(result)
+                    if matched_paths is not None and len(term_results) <= max_results:
+                        matched_paths.add(path.replace(os.sep, '/'))
                     # Убираем `break`, чтобы найти все совпадения в файле
 
             if len(term_results) >= max_results:
@@ -163,24 +190,70 @@ def search_in_files(terms, max_results=5, file_types=None):
         return "Совпадений не найдено."
 
 
-def check_pep8_compliance(max_errors=5):
+def _run_flake8(file_paths, batch_size=500):
     """
-    Проверка кода на соответствие PEP8 с выводом ошибок и нумерацией строк.
+    Запускает flake8 для списка файлов и возвращает ошибки, сгруппированные по файлам.
     """
-    try:
+    errors = {path: [] for path in file_paths}
+    for i in range(0, len(file_paths), batch_size):
+        batch = file_paths[i:i + batch_size]
         result = subprocess.run(
-            ['flake8', project_root, '--format=%(path)s::%(row)d::%(col)d::%(code)s::%(text)s'],
+            ['flake8', *batch, '--format=%(path)s::%(row)d::%(col)d::%(code)s::%(text)s'],
             capture_output=True, text=True
         )
-        if result.stdout:
-            errors = result.stdout.strip().split('\n')
+        for error in result.stdout.strip().split('\n'):
+            if not error:
+                continue
+            path, row, col, code, text = error.split('::', 4)
+            errors.setdefault(path, []).append((int(row), int(col), code, text))
+    return errors
+
+
+def collect_pep8_errors(root=None):
+    """
+    Возвращает ошибки flake8 по всем Python-файлам проекта в виде списка
+    (путь, строка, столбец, код, текст). Файлы, содержимое которых уже
+    проверялось, берутся из кэша.
+    """
+    root = root or project_root
+    file_hashes = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+        for file in sorted(files):
+            if file.endswith('.py'):
+                file_path = os.path.join(dirpath, file)
+                file_hashes[file_path] = file_sha256(file_path)
+
+    file_errors = {path: _lint_cache.get(digest) for path, digest in file_hashes.items()}
+    uncached = [path for path, cached in file_errors.items() if cached is None]
+    if uncached:
+        logger.info(f"flake8: проверка {len(uncached)} из {len(file_hashes)} файлов.")
+        for path, errors in _run_flake8(uncached).items():
+            if path in file_hashes:
+                file_errors[path] = errors
+                _lint_cache[file_hashes[path]] = errors
+
+    errors = []
+    for path in file_hashes:
+        for row, col, code, text in file_errors[path] or []:
+            errors.append((path, row, col, code, text))
+    return errors
+
+
+def check_pep8_compliance(max_errors=5, root=None):
+    """
+    Проверка кода на соответствие PEP8 с выводом ошибок и нумерацией строк.
+    """
+    root = root or project_root
+    try:
+        errors = collect_pep8_errors(root)
+        if errors:
             output = []
-            for error in errors[:max_errors]:
-                path, row, col, code, text = error.split('::')
-                relative_path = os.path.relpath(path, project_root)
+            for path, row, col, code, text in errors[:max_errors]:
+                relative_path = os.path.relpath(path, root)
                 with open(path, 'r', encoding='utf-8') as f:
                     lines = f.readlines()
-                    idx = int(row) - 1
+                    idx = row - 1
                     context_start = max(0, idx - 2)
                     context_end = min(len(lines), idx + 3)
                     context = lines[context_start:context_end]
@@ -202,16 +275,18 @@ def check_pep8_compliance(max_errors=5):
         return "Ошибка при проверке PEP8."
 
 
-def format_project_tree():
+def format_project_tree(root=None):
     """
     Форматирует дерево проекта в виде строки.
     """
+    root_dir = root or project_root
     tree_lines = []
-    for root, dirs, files in os.walk(project_root):
-        level = root.replace(project_root, '').count(os.sep)
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        level = root.replace(root_dir, '').count(os.sep)
         indent = ' ' * 4 * level
         tree_lines.append(f"{indent}{os.path.basename(root)}/")
         subindent = ' ' * 4 * (level + 1)
-        for f in files:
+        for f in sorted(files):
             tree_lines.append(f"{subindent}{f}")
     return '\n'.join(tree_lines)
@@ -0,0 +1,213 @@
+# app/core/utils/file_access.py
+
+import os
+import ast
+import mmap
+import numpy as np
+from app.core.logger import logger
+
+# Размер участка файла, в котором ищутся переводы строк при построении индекса
+SCAN_CHUNK_BYTES = 1024 * 1024
+
+
+class LineIndex:
+    """
+    Индекс смещений начала строк файла, построенный один раз по mmap.
+    Позволяет читать произвольный диапазон строк без чтения всего файла.
+    Файл просматривается участками по SCAN_CHUNK_BYTES, поэтому памяти при
+    построении требуется на один участок и сами смещения, а не на весь файл.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        stat = os.stat(file_path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        if self.size == 0:
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+        newlines = []
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in range(0, self.size, SCAN_CHUNK_BYTES):
+                count = min(SCAN_CHUNK_BYTES, self.size - offset)
+                chunk = np.frombuffer(mm, dtype=np.uint8, count=count, offset=offset)
+                newlines.append(np.flatnonzero(chunk == ord('\n')) + offset)
+                # mmap нельзя закрыть, пока на него ссылается массив
+                del chunk
+        starts = np.concatenate(newlines) + 1
+        if starts.size and starts[-1] == self.size:
+            starts = starts[:-1]
+        self.offsets = np.concatenate(([0], starts)).astype(np.int64)
+
+    @property
+    def line_count(self):
+        return 0 if self.size == 0 else len(self.offsets)
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return True
+        return stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns
+
+    def byte_range(self, start_line, end_line):
+        """
+        Границы в байтах для строк start_line..end_line (нумерация с 1, включительно).
+        """
+        start = int(self.offsets[start_line - 1])
+        end = int(self.offsets[end_line]) if end_line < self.line_count else self.size
+        return start, end
+
+    def read_lines(self, start_line, end_line):
+        """
+        Читает строки start_line..end_line через mmap и возвращает их список.
+        """
+        if self.line_count == 0 or start_line > end_line:
+            return []
+        start, end = self.byte_range(start_line, end_line)
+        with open(self.file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[start:end]
+        text = data.decode('utf-8')
+        lines = text.split('\n')
+        if text.endswith('\n'):
+            lines.pop()
+        return lines
+
+
+class ReadBudget:
+    """
+    Общий лимит строк и байт на один вызов инструмента чтения файлов.
+    """
+
+    def __init__(self, max_lines=None, max_bytes=None):
+        self.lines_left = max_lines
+        self.bytes_left = max_bytes
+
+    @property
+    def exhausted(self):
+        return (self.lines_left is not None and self.lines_left <= 0) or \
+            (self.bytes_left is not None and self.bytes_left <= 0)
+
+    def fit(self, line_index, start_line, end_line):
+        """
+        Возвращает последнюю строку диапазона, которая помещается в оставшийся лимит.
+        """
+        if self.lines_left is not None:
+            end_line = min(end_line, start_line + self.lines_left - 1)
+        if self.bytes_left is not None and end_line >= start_line:
+            start = int(line_index.offsets[start_line - 1])
+            line_ends = np.append(line_index.offsets[1:], line_index.size)
+            fitting = int(np.searchsorted(line_ends, start + self.bytes_left, side='right'))
+            end_line = min(end_line, fitting)
+        return end_line
+
+    def consume(self, line_index, start_line, end_line):
+        if end_line < start_line:
+            return
+        if self.lines_left is not None:
+            self.lines_left -= end_line - start_line + 1
+        if self.bytes_left is not None:
+            start, end = line_index.byte_range(start_line, end_line)
+            self.bytes_left -= end - start
+
+
+def _symbol_ranges(source):
+    """
+    Строит таблицу символов Python-файла: имя -> (первая строка, последняя строка).
+    Для методов доступны как имя метода, так и Class.method.
+    """
+    ranges = {}
+    tree = ast.parse(source)
+
+    def visit(nodes, qualifier):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                kind = 'class' if isinstance(node, ast.ClassDef) else 'def'
+                name = f"{qualifier}{node.name}"
+                for key in (name, f"{kind} {name}", node.name, f"{kind} {node.name}"):
+                    ranges.setdefault(key, (start, node.end_lineno))
+                visit(node.body, f"{name}.")
+
+    visit(tree.body, '')
+    return ranges
+
+
+class FileAccessor:
+    """
+    Доступ к файлам снимка проекта по диапазонам строк и символам.
+    Индексы строк и таблицы символов строятся один раз на файл.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._indexes = {}
+        self._symbols = {}
+
+    def line_index(self, relative_path):
+        index = self._indexes.get(relative_path)
+        if index is None or index.is_stale():
+            index = LineIndex(os.path.join(self.root, relative_path))
+            self._indexes[relative_path] = index
+            self._symbols.pop(relative_path, None)
+        return index
+
+    def symbol_range(self, relative_path, symbol):
+        """
+        Диапазон строк символа, например "class Foo", "def bar" или "Foo.bar".
+        """
+        if relative_path not in self._symbols:
+            index = self.line_index(relative_path)
+            try:
+                source = '\n'.join(index.read_lines(1, index.line_count))
+                self._symbols[relative_path] = _symbol_ranges(source)
+            except (SyntaxError, UnicodeDecodeError, ValueError) as e:
+                logger.warning(f"Не удалось построить таблицу символов {relative_path}: {e}")
+                self._symbols[relative_path] = {}
+        return self._symbols[relative_path].get(' '.join(symbol.split()))
+
+    def read_numbered(self, relative_path, start_line=None, end_line=None, symbol=None,
+                      max_lines=None, budget=None):
+        """
+        Читает диапазон строк файла с нумерацией и форматированием в Markdown.
+        Возвращает None, если файл не удается прочитать или символ не найден.
+        """
+        try:
+            index = self.line_index(relative_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать файл {relative_path}: {e}")
+            return None
+
+        if symbol:
+            symbol_range = self.symbol_range(relative_path, symbol) if relative_path.endswith('.py') else None
+            if symbol_range is None:
+                return None
+            start_line, end_line = symbol_range
+
+        first = max(1, int(start_line or 1))
+        if index.line_count and first > index.line_count:
+            return f"```\n*...Файл содержит {index.line_count} строк...*\n```"
+        if end_line and int(end_line) < first:
+            return (f"```\n*...Пустой диапазон: end_line ({int(end_line)}) меньше start_line ({first}). "
+                    f"Файл содержит {index.line_count} строк...*\n```")
+        last = min(index.line_count, int(end_line or index.line_count))
+        if max_lines:
+            last = min(last, first + int(max_lines) - 1)
+        if budget is not None:
+            last = budget.fit(index, first, last)
+        requested_last = min(index.line_count, int(end_line or index.line_count))
+
+        try:
+            lines = index.read_lines(first, last)
+        except UnicodeDecodeError as e:
+            logger.warning(f"Не удалось прочитать файл {relative_path}: {e}")
+            return None
+        if budget is not None:
+            budget.consume(index, first, last)
+
+        numbered_lines = [f"{idx}\t{line.rstrip()}" for idx, line in enumerate(lines, start=first)]
+        content = '\n'.join(numbered_lines)
+        if last < requested_last:
+            content += (f"\n\n*...Показаны строки {first}-{last} из {index.line_count}, вывод сокращен. "
+                        f"Запросите следующий диапазон через start_line...*")
+        return f"```\n{content}\n```"
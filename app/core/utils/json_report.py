@@ -0,0 +1,240 @@
+# app/core/utils/json_report.py
+
+import json
+
+REPORT_SCHEMA_VERSION = 1
+
+_FINDING_SCHEMA = {
+    'type': 'object',
+    'required': ['checker', 'path', 'line', 'message'],
+    'properties': {
+        'checker': {'type': 'string'},
+        'path': {'type': 'string'},
+        'line': {'type': ['integer', 'null']},
+        'message': {'type': 'string'},
+    },
+}
+
+RULE_RESULT_SCHEMA = {
+    'type': 'object',
+    'required': ['type', 'id', 'rule', 'passed', 'sources', 'carried_over', 'timed_out', 'findings', 'report'],
+    'properties': {
+        'type': {'const': 'rule'},
+        'id': {'type': 'string'},
+        'rule': {'type': 'string'},
+        'passed': {'type': 'boolean'},
+        'sources': {'type': 'array', 'items': {'enum': ['static', 'llm']}},
+        'carried_over': {'type': 'boolean'},
+        'timed_out': {'type': 'boolean', 'description': 'Модель не ответила вовремя, правило не проверено'},
+        'findings': {'type': 'array', 'items': _FINDING_SCHEMA},
+        'report': {'type': ['string', 'null'], 'description': 'Отчет по правилу в формате Markdown'},
+    },
+}
+
+SUMMARY_SCHEMA = {
+    'type': 'object',
+    'required': ['type', 'project', 'snapshot_id', 'status', 'passed', 'rules_total', 'rules_failed',
+                 'failed_rules', 'completed_rules', 'timed_out_rules'],
+    'properties': {
+        'type': {'const': 'summary'},
+        'project': {'type': 'string'},
+        'snapshot_id': {'type': 'string'},
+        'status': {'enum': ['completed', 'cancelled', 'failed'],
+                   'description': 'cancelled - анализ прерван, failed - анализ завершился ошибкой; '
+                                  'в обоих случаях проверена только часть правил'},
+        'cancel_reason': {'enum': ['client_disconnected', 'deadline_exceeded']},
+        'error': {'type': 'string', 'description': 'Ошибка, из-за которой анализ не завершен (status=failed)'},
+        'passed': {'type': 'boolean'},
+        'rules_total': {'type': 'integer'},
+        'rules_failed': {'type': 'integer'},
+        'failed_rules': {'type': 'array', 'items': {'type': 'string'}},
+        'timed_out_rules': {'type': 'array', 'items': {'type': 'string'}},
+        'completed_rules': {'type': 'array', 'items': {'type': 'string'}},
+        'duration_seconds': {'type': 'number'},
+    },
+}
+
+JSON_REPORT_SCHEMA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'title': 'Отчет по анализу кода',
+    'type': 'object',
+    'required': ['schema_version', 'summary', 'rules'],
+    'properties': {
+        'schema_version': {'const': REPORT_SCHEMA_VERSION},
+        'summary': SUMMARY_SCHEMA,
+        'rules': {'type': 'array', 'items': RULE_RESULT_SCHEMA},
+    },
+}
+
+
+BATCH_SUMMARY_SCHEMA = {
+    'type': 'object',
+    'required': ['type', 'status', 'passed', 'projects_total', 'projects_failed', 'failed_projects',
+                 'errors', 'rule_failures'],
+    'properties': {
+        'type': {'const': 'batch_summary'},
+        'status': {'enum': ['completed', 'cancelled']},
+        'cancel_reason': {'enum': ['client_disconnected', 'deadline_exceeded']},
+        'passed': {'type': 'boolean'},
+        'projects_total': {'type': 'integer'},
+        'projects_failed': {'type': 'integer'},
+        'failed_projects': {'type': 'array', 'items': {'type': 'string'}},
+        'errors': {
+            'type': 'array',
+            'description': 'Проекты, которые не удалось подготовить к анализу, и правила, '
+                           'проверка которых завершилась ошибкой (указан rule)',
+            'items': {
+                'type': 'object',
+                'required': ['project', 'error'],
+                'properties': {
+                    'project': {'type': 'string'},
+                    'rule': {'type': 'string'},
+                    'error': {'type': 'string'},
+                },
+            },
+        },
+        'rule_failures': {
+            'type': 'object',
+            'description': 'id правила -> проекты, в которых оно нарушено',
+            'additionalProperties': {'type': 'array', 'items': {'type': 'string'}},
+        },
+        'duration_seconds': {'type': 'number'},
+    },
+}
+
+BATCH_REPORT_SCHEMA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'title': 'Отчет по пакетному анализу проектов',
+    'type': 'object',
+    'required': ['schema_version', 'summary', 'projects'],
+    'properties': {
+        'schema_version': {'const': REPORT_SCHEMA_VERSION},
+        'summary': BATCH_SUMMARY_SCHEMA,
+        'projects': {
+            'type': 'array',
+            'items': {key: value for key, value in JSON_REPORT_SCHEMA.items() if key != '$schema'},
+        },
+    },
+}
+
+
+def rule_result(rule_id, record):
+    """
+    Преобразует запись о проверке правила в результат для JSON/NDJSON отчета.
+    """
+    static = record.get('static')
+    llm = record.get('llm')
+    sources = []
+    findings = []
+    if static is not None:
+        sources.append('static')
+        findings = [
+            {'checker': f['checker'], 'path': f['path'], 'line': f['line'], 'message': f['message']}
+            for f in static['findings']
+        ]
+    if llm is not None:
+        sources.append('llm')
+    return {
+        'type': 'rule',
+        'id': rule_id,
+        'rule': record['rule'],
+        'passed': record['passed'],
+        'sources': sources,
+        'carried_over': bool(llm and llm.get('carried_over')),
+        'timed_out': bool(llm and llm.get('timed_out')),
+        'findings': findings,
+        'report': record['report'],
+    }
+
+
+def summary(project, snapshot_id, rule_results, duration=None, rules_total=None, cancel_reason=None, error=None):
+    """
+    Итоговая запись отчета. Если анализ прерван (cancel_reason) или завершился
+    ошибкой (error), в rules_total указывается число всех правил, а в
+    completed_rules - успевшие проверки.
+    Проект не считается прошедшим, если проверены не все правила.
+    """
+    failed_rules = [result['id'] for result in rule_results if not result['passed']]
+    rules_total = len(rule_results) if rules_total is None else rules_total
+    result = {
+        'type': 'summary',
+        'project': project,
+        'snapshot_id': snapshot_id,
+        'status': 'failed' if error else ('cancelled' if cancel_reason else 'completed'),
+        'passed': not failed_rules and not cancel_reason and not error and len(rule_results) == rules_total,
+        'rules_total': rules_total,
+        'rules_failed': len(failed_rules),
+        'failed_rules': failed_rules,
+        'completed_rules': [result['id'] for result in rule_results],
+        'timed_out_rules': [result['id'] for result in rule_results if result['timed_out']],
+    }
+    if cancel_reason:
+        result['cancel_reason'] = cancel_reason
+    if error:
+        result['error'] = error
+    if duration is not None:
+        result['duration_seconds'] = round(duration, 3)
+    return result
+
+
+def build_json_report(project, snapshot_id, rule_results, duration=None, rules_total=None, cancel_reason=None,
+                      error=None):
+    """
+    Собирает отчет для CI в формате, описанном JSON_REPORT_SCHEMA.
+    """
+    return {
+        'schema_version': REPORT_SCHEMA_VERSION,
+        'summary': summary(project, snapshot_id, rule_results, duration, rules_total, cancel_reason, error),
+        'rules': rule_results,
+    }
+
+
+def batch_summary(reports, errors, duration=None, cancel_reason=None):
+    """
+    Сводка пакетного анализа по отчетам проектов (см. build_json_report).
+    Проект, проверка правила которого завершилась ошибкой, считается не прошедшим.
+    """
+    errored_projects = {error['project'] for error in errors if 'rule' in error}
+    failed_projects = [report['summary']['project'] for report in reports
+                       if report['summary']['rules_failed'] or report['summary']['project'] in errored_projects]
+    # Правила перечисляются в порядке rules.json
+    rule_failures = {}
+    for report in reports:
+        for result in report['rules']:
+            rule_failures.setdefault(result['id'], [])
+            if not result['passed']:
+                rule_failures[result['id']].append(report['summary']['project'])
+    rule_failures = {rule_id: projects for rule_id, projects in rule_failures.items() if projects}
+    result = {
+        'type': 'batch_summary',
+        'status': 'cancelled' if cancel_reason else 'completed',
+        'passed': not failed_projects and not errors and not cancel_reason,
+        'projects_total': len(reports) + sum(1 for error in errors if 'rule' not in error),
+        'projects_failed': len(failed_projects),
+        'failed_projects': failed_projects,
+        'errors': errors,
+        'rule_failures': rule_failures,
+    }
+    if cancel_reason:
+        result['cancel_reason'] = cancel_reason
+    if duration is not None:
+        result['duration_seconds'] = round(duration, 3)
+    return result
+
+
+def build_batch_report(reports, errors, duration=None, cancel_reason=None):
+    """
+    Собирает отчет пакетного анализа в формате, описанном BATCH_REPORT_SCHEMA.
+    """
+    return {
+        'schema_version': REPORT_SCHEMA_VERSION,
+        'summary': batch_summary(reports, errors, duration, cancel_reason),
+        'projects': reports,
+    }
+
+
+def to_ndjson(record):
+    """
+    Сериализует запись в одну строку NDJSON.
+    """
+    return json.dumps(record, ensure_ascii=False) + '\n'
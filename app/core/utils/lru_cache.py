@@ -0,0 +1,37 @@
+# app/core/utils/lru_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Кэш с ограничением числа записей: при переполнении вытесняются записи,
+    к которым дольше всего не обращались. Потокобезопасен.
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,40 @@
+# app/core/utils/ollama_client.py
+
+import socket
+import threading
+import ollama
+
+
+def abortable_client(timeout):
+    """
+    Клиент Ollama, соединение которого можно оборвать из другого потока.
+    Закрытие httpx-клиента не прерывает поток, ожидающий ответа, поэтому
+    сокет запоминается при подключении (trace httpcore), а abort() вызывает
+    для него shutdown(). Соединение, открытое после abort(), обрывается сразу.
+    """
+    sockets = []
+    aborted = threading.Event()
+
+    def shutdown(sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def trace(event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            sock = info['return_value'].get_extra_info('socket')
+            if sock is not None:
+                sockets.append(sock)
+                if aborted.is_set():
+                    shutdown(sock)
+
+    def add_trace(request):
+        request.extensions['trace'] = trace
+
+    def abort():
+        aborted.set()
+        for sock in list(sockets):
+            shutdown(sock)
+
+    return ollama.Client(timeout=timeout, event_hooks={'request': [add_trace]}), abort
@@ -0,0 +1,320 @@
+# app/core/utils/semantic_search.py
+
+import os
+import re
+import ast
+import hashlib
+import mimetypes
+import threading
+import numpy as np
+from rank_bm25 import BM25Okapi
+from app.core.logger import logger
+from app.core.utils.code_analysis import tokenize_document
+from app.core.utils.snapshot import EXCLUDED_DIRS
+from app.core.utils.lru_cache import LRUCache
+from app.core.utils.ollama_client import abortable_client
+from app.core.config import Config
+
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-zА-Яа-яЁё_][A-Za-zА-Яа-яЁё0-9_]*')
+
+# Векторы фрагментов по имени эмбеддера и хэшу содержимого фрагмента.
+# Общие для всех проверок, поэтому между ревизиями проекта пересчитываются
+# только измененные фрагменты.
+_vector_cache = LRUCache(Config().cache.vectors_max_items)
+
+
+class Chunk:
+    def __init__(self, path, start_line, end_line, text, name=None):
+        self.path = path
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+        self.name = name
+        self.digest = hashlib.sha256(f"{path}\n{text}".encode('utf-8')).hexdigest()
+
+
+def _windows(path, lines, start, end, window, overlap, name=None):
+    """
+    Делит диапазон строк [start, end) на окна фиксированного размера.
+    """
+    chunks = []
+    step = max(1, window - overlap)
+    position = start
+    while position < end:
+        chunk_end = min(end, position + window)
+        text = '\n'.join(lines[position:chunk_end])
+        if text.strip():
+            chunks.append(Chunk(path, position + 1, chunk_end, text, name))
+        if chunk_end == end:
+            break
+        position += step
+    return chunks
+
+
+def chunk_python(path, source, max_chunk_lines=80):
+    """
+    Делит Python-файл на фрагменты уровня функций и классов. Большие классы
+    делятся на методы, код модуля вне определений - на окна строк.
+    """
+    lines = source.splitlines()
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return chunk_text(path, source, max_chunk_lines)
+
+    chunks = []
+    covered = [False] * len(lines)
+
+    def add_node(node, qualifier=''):
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])]) - 1
+        end = node.end_lineno
+        name = f"{qualifier}{node.name}"
+        if isinstance(node, ast.ClassDef) and end - start > max_chunk_lines:
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            body_start = methods[0].lineno - 1 if methods else end
+            # Заголовок класса: объявление, докстринг и атрибуты до первого метода
+            chunks.extend(_windows(path, lines, start, body_start, max_chunk_lines, 0, name))
+            for i in range(start, body_start):
+                covered[i] = True
+            for method in methods:
+                add_node(method, qualifier=f"{name}.")
+            return
+        chunks.extend(_windows(path, lines, start, end, max_chunk_lines, max_chunk_lines // 8, name))
+        for i in range(start, end):
+            covered[i] = True
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            add_node(node)
+
+    # Код уровня модуля вне функций и классов
+    position = 0
+    while position < len(lines):
+        if covered[position]:
+            position += 1
+            continue
+        gap_end = position
+        while gap_end < len(lines) and not covered[gap_end]:
+            gap_end += 1
+        chunks.extend(_windows(path, lines, position, gap_end, max_chunk_lines, 0))
+        position = gap_end
+    return sorted(chunks, key=lambda chunk: chunk.start_line)
+
+
+def chunk_text(path, source, max_chunk_lines=80):
+    """
+    Делит произвольный текстовый файл на перекрывающиеся окна строк.
+    """
+    lines = source.splitlines()
+    return _windows(path, lines, 0, len(lines), max_chunk_lines, max_chunk_lines // 4)
+
+
+def _identifier_tokens(text):
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(text):
+        parts = [p for p in re.split(r'_|(?<=[a-zа-я])(?=[A-ZА-Я])', identifier) if p]
+        tokens.append(identifier.lower())
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class HashingEmbedder:
+    """
+    Детерминированный локальный эмбеддер на основе хэширования токенов.
+    Не требует модели, используется в тестах и как запасной вариант.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts, cancel_token=None):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _identifier_tokens(text):
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return vectors
+
+
+class OllamaEmbedder:
+    """
+    Эмбеддер на основе модели эмбеддингов, развернутой в Ollama.
+    Каждый вызов модели ограничен timeout секундами и сроком задачи
+    (cancel_token); при отмене задачи запрос к Ollama обрывается, а
+    оставшиеся порции не отправляются. При недоступности модели индекс
+    переходит на HashingEmbedder размерности fallback_dim.
+    """
+
+    def __init__(self, model_name, batch_size=32, timeout=None, fallback_dim=512):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.fallback_dim = fallback_dim
+        self.name = f"ollama-{model_name}"
+
+    def embed(self, texts, cancel_token=None):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            if cancel_token is not None:
+                cancel_token.check()
+            timeout = self.timeout
+            if cancel_token is not None and cancel_token.remaining() is not None:
+                timeout = min(timeout or cancel_token.remaining(), cancel_token.remaining())
+            client, abort = abortable_client(max(timeout, 0.1) if timeout is not None else None)
+            if cancel_token is not None:
+                cancel_token.add_callback(abort)
+            try:
+                with client:
+                    response = client.embed(model=self.model_name, input=texts[i:i + self.batch_size])
+            except Exception:
+                # Соединение оборвано при отмене задачи
+                if cancel_token is not None:
+                    cancel_token.check()
+                raise
+            finally:
+                if cancel_token is not None:
+                    cancel_token.remove_callback(abort)
+            vectors.extend(response['embeddings'])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_embedder(retrieval_config, timeout=None):
+    """
+    Эмбеддер по настройкам [retrieval]. timeout ограничивает один вызов
+    модели эмбеддингов (см. llm.call_timeout_seconds).
+    """
+    if retrieval_config.embedder == 'ollama':
+        return OllamaEmbedder(retrieval_config.embedding_model, timeout=timeout,
+                              fallback_dim=retrieval_config.hashing_dim)
+    return HashingEmbedder(retrieval_config.hashing_dim)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _min_max(scores):
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.size == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-9:
+        return np.zeros_like(scores) if high <= 0 else np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+class SemanticIndex:
+    """
+    Индекс фрагментов проекта для гибридного поиска: косинусная близость
+    эмбеддингов, объединенная с BM25 по тем же фрагментам.
+    """
+
+    def __init__(self, root, embedder, file_types, max_chunk_lines=80, alpha=0.5):
+        self.root = root
+        self.embedder = embedder
+        self.file_types = file_types
+        self.max_chunk_lines = max_chunk_lines
+        self.alpha = alpha
+        self.chunks = []
+        self.matrix = None
+        self.bm25 = None
+        self.built = False
+        self._lock = threading.Lock()
+
+    def _collect_chunks(self):
+        chunks = []
+        for dirpath, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+            for file in sorted(files):
+                if not any(file.endswith(ext) for ext in self.file_types):
+                    continue
+                file_path = os.path.join(dirpath, file)
+                mime_type, _ = mimetypes.guess_type(file_path)
+                if not mime_type or not mime_type.startswith('text'):
+                    continue
+                relative_path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        source = f.read()
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"Не удалось прочитать файл {file_path}: {e}")
+                    continue
+                if file.endswith('.py'):
+                    chunks.extend(chunk_python(relative_path, source, self.max_chunk_lines))
+                else:
+                    chunks.extend(chunk_text(relative_path, source, self.max_chunk_lines))
+        return chunks
+
+    def _embed_chunks(self, chunks, cancel_token=None):
+        vectors_by_digest = {c.digest: _vector_cache.get((self.embedder.name, c.digest)) for c in chunks}
+        missing = [c for c in chunks if vectors_by_digest[c.digest] is None]
+        if missing:
+            logger.info(f"Семантический индекс: вычисление {len(missing)} из {len(chunks)} эмбеддингов.")
+            try:
+                vectors = self.embedder.embed([c.text for c in missing], cancel_token)
+            except Exception as e:
+                # Отмена задачи пробрасывается, а не заменяется локальным эмбеддером
+                if cancel_token is not None:
+                    cancel_token.check()
+                if isinstance(self.embedder, HashingEmbedder):
+                    raise
+                logger.error(f"Ошибка эмбеддера {self.embedder.name}: {e}. Используется локальный эмбеддер.")
+                self.embedder = HashingEmbedder(self.embedder.fallback_dim)
+                return self._embed_chunks(chunks, cancel_token)
+            for chunk, vector in zip(missing, vectors):
+                vectors_by_digest[chunk.digest] = vector
+                _vector_cache[(self.embedder.name, chunk.digest)] = vector
+        return np.stack([vectors_by_digest[c.digest] for c in chunks])
+
+    def build(self, cancel_token=None):
+        chunks = self._collect_chunks()
+        if chunks:
+            self.matrix = _normalize_rows(self._embed_chunks(chunks, cancel_token))
+            self.bm25 = BM25Okapi([tokenize_document(c.text) or [''] for c in chunks])
+            logger.info(f"Семантический индекс построен: {len(chunks)} фрагментов.")
+        # Прерванное построение не оставляет частично заполненный индекс
+        self.chunks = chunks
+        self.built = True
+        return self
+
+    def ensure_built(self, cancel_token=None):
+        """
+        Строит индекс при первом обращении. Индекс может быть общим для
+        нескольких проверок, выполняющихся в разных потоках. Если построение
+        прервано отменой, индекс остается непостроенным.
+        """
+        with self._lock:
+            if not self.built:
+                self.build(cancel_token)
+        return self
+
+    def search(self, query, top_k=5, cancel_token=None):
+        """
+        Возвращает top_k фрагментов с наибольшей гибридной оценкой.
+        """
+        if not self.chunks:
+            return []
+        query_vector = _normalize_rows(self.embedder.embed([query], cancel_token))[0]
+        dense_scores = self.matrix @ query_vector
+        lexical_scores = self.bm25.get_scores(tokenize_document(query))
+        scores = self.alpha * _min_max(dense_scores) + (1 - self.alpha) * _min_max(lexical_scores)
+        top = np.argsort(-scores)[:top_k]
+        return [(self.chunks[i], float(scores[i])) for i in top if dense_scores[i] > 0 or lexical_scores[i] > 0]
+
+
+def format_semantic_results(results):
+    if not results:
+        return "Совпадений не найдено."
+    output = []
+    for chunk, score in results:
+        header = f"#### {chunk.path} (строки {chunk.start_line}-{chunk.end_line}"
+        header += f", {chunk.name})" if chunk.name else ")"
+        numbered = [f"{i}\t{line}" for i, line in enumerate(chunk.text.split('\n'), start=chunk.start_line)]
+        output.append(f"{header}\n```\n" + '\n'.join(numbered) + "\n```")
+    return '\n\n'.join(output)
@@ -0,0 +1,208 @@
+# app/core/utils/snapshot.py
+
+import os
+import json
+import time
+import hashlib
+from app.core.logger import logger
+
+EXCLUDED_DIRS = {'.venv', 'venv', '__pycache__', '.git'}
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Вычисляет SHA-256 содержимого файла.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(root_dir):
+    """
+    Строит манифест проекта: относительный путь файла -> хэш содержимого.
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(root_dir):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        for file in files:
+            file_path = os.path.join(root, file)
+            relative_path = os.path.relpath(file_path, root_dir).replace(os.sep, '/')
+            try:
+                manifest[relative_path] = file_sha256(file_path)
+            except OSError as e:
+                logger.warning(f"Не удалось вычислить хэш файла {file_path}: {e}")
+    return manifest
+
+
+class ManifestDiff:
+    def __init__(self, added, removed, modified):
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+
+    @property
+    def changed(self):
+        return self.added | self.removed | self.modified
+
+    @property
+    def tree_changed(self):
+        return bool(self.added or self.removed)
+
+    def __repr__(self):
+        return (f"ManifestDiff(added={len(self.added)}, removed={len(self.removed)}, "
+                f"modified={len(self.modified)})")
+
+
+def diff_manifests(old_manifest, new_manifest):
+    """
+    Сравнивает два манифеста по хэшам содержимого.
+    """
+    old_paths = set(old_manifest)
+    new_paths = set(new_manifest)
+    modified = {
+        path for path in old_paths & new_paths
+        if old_manifest[path] != new_manifest[path]
+    }
+    return ManifestDiff(new_paths - old_paths, old_paths - new_paths, modified)
+
+
+def _path_affected(path, changed_paths):
+    """
+    Проверяет, затронут ли путь (файл или каталог) изменениями.
+    """
+    path = os.path.normpath(path).replace(os.sep, '/')
+    if path in ('.', ''):
+        return bool(changed_paths)
+    prefix = path.rstrip('/') + '/'
+    return any(changed == path or changed.startswith(prefix) for changed in changed_paths)
+
+
+def _search_affected(search, diff, root_dir):
+    """
+    Проверяет, мог ли измениться результат поиска: изменился ли файл подходящего
+    типа, который теперь содержит один из искомых терминов.
+    """
+    file_types = search.get('file_types')
+    terms = search.get('terms')
+    candidates = diff.added | diff.modified
+    if terms is None:
+        # Инструмент зависит от всех файлов заданных типов (например, flake8)
+        candidates = diff.changed
+    for path in candidates:
+        if file_types and not any(path.endswith(ext) for ext in file_types):
+            continue
+        if terms is None:
+            return True
+        try:
+            with open(os.path.join(root_dir, path), 'r', encoding='utf-8') as f:
+                content = f.read().lower()
+        except (OSError, UnicodeDecodeError):
+            continue
+        if any(term.lower() in content for term in terms):
+            return True
+    return False
+
+
+def needs_reanalysis(record, rule, model_name, diff, root_dir, analysis_version=None):
+    """
+    Определяет, нужно ли заново проверять правило, или вердикт из предыдущего
+    снимка можно перенести. Решение принимается по файлам, к которым модель
+    обращалась через инструменты при предыдущей проверке. После изменения
+    правил, промптов или параметров анализа (analysis_version) вердикт
+    не переносится.
+    """
+    if record.get('rule') != rule or record.get('model') != model_name:
+        return True
+    if record.get('analysis_version') != analysis_version:
+        return True
+    dependencies = record.get('dependencies')
+    if dependencies is None:
+        return True
+    if not diff.changed:
+        return False
+    if any(_path_affected(path, diff.changed) for path in dependencies.get('paths', [])):
+        return True
+    if any(_search_affected(search, diff, root_dir) for search in dependencies.get('searches', [])):
+        return True
+    # Без вызовов инструментов модель опиралась только на дерево проекта
+    if not dependencies.get('tool_calls') and diff.tree_changed:
+        return True
+    return False
+
+
+class SnapshotStore:
+    """
+    Хранилище снимков проекта: манифест и результаты проверки каждого правила.
+    Снимки старше ttl_seconds и самые старые сверх max_count удаляются prune().
+    Загрузка снимка продлевает его срок жизни.
+    """
+
+    def __init__(self, snapshots_dir, ttl_seconds=None, max_count=None):
+        self.snapshots_dir = snapshots_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_count = max_count
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    def _path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def load(self, snapshot_id):
+        if not snapshot_id or not snapshot_id.isalnum():
+            return None
+        path = self._path(snapshot_id)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            os.utime(path)
+            return snapshot
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Не удалось загрузить снимок {snapshot_id}: {e}")
+            return None
+
+    def save(self, snapshot_id, manifest, rules, analysis_version=None):
+        snapshot = {
+            'id': snapshot_id,
+            'created_at': time.time(),
+            'analysis_version': analysis_version,
+            'manifest': manifest,
+            'rules': rules,
+        }
+        tmp_path = self._path(snapshot_id) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(snapshot_id))
+        logger.info(f"Снимок {snapshot_id} сохранен ({len(manifest)} файлов).")
+        return snapshot
+
+    def prune(self):
+        """
+        Удаляет устаревшие снимки. Возвращает число удаленных файлов.
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.snapshots_dir):
+            path = os.path.join(self.snapshots_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+
+        removed = 0
+        for position, (mtime, path) in enumerate(entries):
+            expired = self.ttl_seconds is not None and now - mtime > self.ttl_seconds
+            excess = self.max_count is not None and position >= self.max_count
+            if expired or excess:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"Не удалось удалить снимок {path}: {e}")
+        if removed:
+            logger.info(f"Удалено устаревших снимков: {removed}")
+        return removed
@@ -5,4 +5,26 @@ import os
 
 def unzip_file(zip_path, extract_to):
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
\ No newline at end of file
+        zip_ref.extractall(extract_to)
+
+
+def zip_uncompressed_size(zip_path):
+    """Суммарный размер файлов архива после распаковки (по заголовкам архива)."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return sum(info.file_size for info in zip_ref.infolist())
+
+
+# Служебные записи, которые архиваторы добавляют рядом с каталогом проекта
+ARCHIVE_METADATA = {'__MACOSX', '.DS_Store'}
+
+
+def archive_root(extract_to):
+    """
+    Корень проекта в распакованном архиве. Обычно архив репозитория содержит
+    один каталог верхнего уровня (proj/.gitignore, proj/src/...), и тогда
+    корнем проекта считается этот каталог, иначе - сам каталог распаковки.
+    """
+    entries = [name for name in os.listdir(extract_to) if name not in ARCHIVE_METADATA]
+    if len(entries) == 1 and os.path.isdir(os.path.join(extract_to, entries[0])):
+        return os.path.join(extract_to, entries[0])
+    return extract_to
@@ -0,0 +1,215 @@
+# app/core/utils/workspace.py
+
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import asyncio
+import threading
+from contextlib import contextmanager
+from app.core.logger import logger
+from app.core.utils.unzip import unzip_file, zip_uncompressed_size
+
+
+class WorkspaceQuotaError(Exception):
+    """Превышена квота на размер рабочего каталога задачи или на общий объем диска."""
+
+    def __init__(self, message, per_job):
+        super().__init__(message)
+        self.per_job = per_job
+
+
+class Workspace:
+    """
+    Уникальный рабочий каталог одной задачи: загруженный архив и распакованный проект.
+    """
+
+    def __init__(self, job_id, path):
+        self.job_id = job_id
+        self.path = path
+        self.zip_path = os.path.join(path, 'upload.zip')
+        self.project_dir = os.path.join(path, 'project')
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.references = 0
+        self.reserved_bytes = 0
+
+
+class WorkspaceManager:
+    """
+    Выделяет рабочие каталоги задач, следит за квотами и удаляет каталоги,
+    на которые больше никто не ссылается. Каталог живет, пока на него есть
+    ссылки (запрос, выполняющаяся задача, а затем ее результат в кэше
+    SingleFlight до истечения result_ttl), и удаляется при освобождении
+    последней ссылки. Сборщик мусора удаляет каталоги,
+    оставшиеся после сбоев, по истечении TTL.
+    """
+
+    def __init__(self, workspace_config, default_root):
+        root = default_root
+        if workspace_config.use_tmpfs:
+            if os.path.isdir(workspace_config.tmpfs_dir):
+                root = os.path.join(workspace_config.tmpfs_dir, 'code_analyzer_workspaces')
+            else:
+                logger.warning(f"tmpfs каталог {workspace_config.tmpfs_dir} недоступен, "
+                               f"используется {default_root}")
+        self.root = os.path.abspath(root)
+        self.max_total_bytes = workspace_config.max_total_bytes
+        self.max_job_bytes = workspace_config.max_job_bytes
+        self.ttl_seconds = workspace_config.ttl_seconds
+        self.max_age_seconds = workspace_config.max_age_seconds
+        self.gc_interval_seconds = workspace_config.gc_interval_seconds
+        self._workspaces = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # Выделение и освобождение
+
+    def allocate(self, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        path = os.path.join(self.root, job_id)
+        os.makedirs(path)
+        workspace = Workspace(job_id, path)
+        workspace.references = 1
+        with self._lock:
+            self._workspaces[job_id] = workspace
+        logger.info(f"Выделен рабочий каталог {path}")
+        return workspace
+
+    def retain(self, workspace):
+        with self._lock:
+            workspace.references += 1
+            workspace.last_used = time.time()
+
+    def release(self, workspace):
+        with self._lock:
+            workspace.references -= 1
+            workspace.last_used = time.time()
+            remove = workspace.references <= 0 and self._workspaces.get(workspace.job_id) is workspace
+            if remove:
+                del self._workspaces[workspace.job_id]
+        if remove:
+            self._remove(workspace.path)
+
+    @contextmanager
+    def job(self, job_id=None):
+        """
+        Рабочий каталог задачи, который гарантированно освобождается при выходе
+        из блока, в том числе при ошибке. Чтобы каталог пережил блок (например,
+        для потокового ответа), на него нужно взять ссылку через retain().
+        """
+        workspace = self.allocate(job_id)
+        try:
+            yield workspace
+        finally:
+            self.release(workspace)
+
+    # Квоты
+
+    def _reserve(self, workspace, size):
+        if workspace.reserved_bytes + size > self.max_job_bytes:
+            raise WorkspaceQuotaError(
+                f"Размер задачи превышает лимит {self.max_job_bytes} байт.", per_job=True)
+        with self._lock:
+            used = sum(ws.reserved_bytes for ws in self._workspaces.values())
+            if used + size > self.max_total_bytes:
+                raise WorkspaceQuotaError(
+                    "Недостаточно места для новых задач, попробуйте позже.", per_job=False)
+            workspace.reserved_bytes += size
+
+    def save_upload(self, workspace, fileobj, zip_path=None, chunk_size=1024 * 1024):
+        """
+        Сохраняет загруженный архив в рабочий каталог с проверкой квот.
+        zip_path задается, если в задаче несколько архивов (пакетный анализ).
+        Возвращает SHA-256 содержимого архива.
+        """
+        zip_path = zip_path or workspace.zip_path
+        os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+        digest = hashlib.sha256()
+        with open(zip_path, 'wb') as buffer:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                self._reserve(workspace, len(chunk))
+                buffer.write(chunk)
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def extract(self, workspace, zip_path=None, extract_to=None):
+        """
+        Распаковывает архив задачи. Размер распакованных данных проверяется
+        по заголовкам архива до распаковки.
+        """
+        zip_path = zip_path or workspace.zip_path
+        extract_to = extract_to or workspace.project_dir
+        self._reserve(workspace, zip_uncompressed_size(zip_path))
+        unzip_file(zip_path, extract_to)
+        # Архив больше не нужен, его место возвращается в квоту
+        size = os.path.getsize(zip_path)
+        os.remove(zip_path)
+        with self._lock:
+            workspace.reserved_bytes -= size
+        return extract_to
+
+    # Сборка мусора
+
+    def _remove(self, path):
+        try:
+            shutil.rmtree(path)
+            logger.info(f"Deleted: {path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error deleting {path}: {e}")
+
+    def collect_garbage(self):
+        """
+        Удаляет каталоги без владельца старше TTL (например, оставшиеся после
+        перезапуска) и зависшие задачи старше max_age_seconds.
+        """
+        now = time.time()
+        expired = []
+        with self._lock:
+            for job_id, workspace in list(self._workspaces.items()):
+                if now - workspace.created_at > self.max_age_seconds:
+                    logger.warning(f"Рабочий каталог {workspace.path} удерживается дольше "
+                                   f"{self.max_age_seconds} с и будет удален.")
+                    expired.append(self._workspaces.pop(job_id))
+            tracked = set(self._workspaces)
+        for workspace in expired:
+            self._remove(workspace.path)
+
+        removed = len(expired)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name in tracked:
+                continue
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            if age > self.ttl_seconds:
+                if os.path.isdir(path):
+                    self._remove(path)
+                else:
+                    os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Сборщик мусора удалил рабочих каталогов: {removed}")
+        return removed
+
+    async def run_garbage_collector(self, *collectors):
+        """
+        Периодически запускает сборку мусора. Запускается при старте приложения.
+        collectors - дополнительные функции очистки, выполняемые с тем же
+        интервалом (например, удаление устаревших снимков).
+        """
+        while True:
+            for collect in (self.collect_garbage,) + collectors:
+                try:
+                    await asyncio.to_thread(collect)
+                except Exception as e:
+                    logger.error(f"Ошибка сборщика мусора ({collect.__name__}): {e}")
+            await asyncio.sleep(self.gc_interval_seconds)
@@ -1,17 +1,20 @@
 # app/main.py
 
+import asyncio
 from fastapi import FastAPI
-from app.api.v1.endpoints.router import router as api_router
+from app.api.v1.endpoints.router import router as api_router, workspace_manager, snapshot_store
 from app.core.logger import logger
 
 app = FastAPI(title="Code Analyzer")
 
 @app.on_event("startup")
 async def startup_event():
+    app.state.workspace_gc = asyncio.create_task(workspace_manager.run_garbage_collector(snapshot_store.prune))
     logger.info("Приложение запущено.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.workspace_gc.cancel()
     logger.info("Приложение остановлено.")
 
 app.include_router(api_router, prefix="/api/v1")
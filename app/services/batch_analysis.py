@@ -0,0 +1,124 @@
+# app/services/batch_analysis.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.core.logger import logger
+from app.core.utils.snapshot import EXCLUDED_DIRS, build_manifest
+from app.core.analysis.static_checkers import run_static_checks
+from app.core.utils.file_access import FileAccessor
+from app.core.utils.semantic_search import SemanticIndex, create_embedder
+from app.services.llm_model import LLMModel
+from app.services.rule_analysis import analyze_rule_obj
+from app.services.cancellation import AnalysisCancelled
+
+
+class BatchProject:
+    """
+    Проект пакетного анализа: каталог, снимок и результаты проверки правил.
+    error - ошибка подготовки проекта, rule_errors - ошибки проверки
+    отдельных правил (id правила -> текст ошибки).
+    """
+
+    def __init__(self, name, root, snapshot_id):
+        self.name = name
+        self.root = root
+        self.snapshot_id = snapshot_id
+        self.manifest = None
+        self.static_results = None
+        self.error = None
+        self.records = {}
+        self.rule_errors = {}
+        # Индексы снимка общие для всех правил проекта и строятся один раз
+        self.file_accessor = FileAccessor(root)
+        self.semantic_index = None
+
+
+def discover_projects(extract_dir):
+    """
+    Каталоги верхнего уровня распакованного архива, каждый из которых - отдельный проект.
+    Возвращает список пар (имя, путь).
+    """
+    names = sorted(
+        name for name in os.listdir(extract_dir)
+        if os.path.isdir(os.path.join(extract_dir, name))
+        and name not in EXCLUDED_DIRS and not name.startswith(('.', '__MACOSX'))
+    )
+    return [(name, os.path.join(extract_dir, name)) for name in names]
+
+
+def build_project_snapshot(root, options):
+    """
+    Манифест и результаты статических проверок проекта. Выполняется в пуле
+    процессов по одному проекту на процесс, поэтому файлы внутри проекта
+    проверяются последовательно.
+    """
+    manifest = build_manifest(root)
+    return manifest, run_static_checks(root, manifest, options, workers=1)
+
+
+def schedule_rule_pairs(projects, rules):
+    """
+    Порядок проверки пар (правило, проект): сначала все проекты по первому
+    правилу, затем по второму и т.д. Одновременные вызовы модели относятся
+    к одному правилу и начинаются с одинакового префикса (системный промпт
+    и текст правила), поэтому Ollama переиспользует кэш этого префикса.
+    """
+    return [(index, rule_obj, project)
+            for index, rule_obj in enumerate(rules, start=1)
+            for project in projects if project.error is None]
+
+
+def run_rule_pairs(projects, rules, config, cancel_token=None, analysis_version=None):
+    """
+    Проверяет все пары (правило, проект), выполняя до config.batch.llm_concurrency
+    проверок одновременно. Результаты записываются в project.records, ошибка
+    проверки пары - в project.rule_errors, остальные пары при этом продолжают
+    проверяться. Пакет прерывается только при отмене через cancel_token:
+    оставшиеся пары не запускаются, а AnalysisCancelled пробрасывается
+    после остановки выполняющихся проверок.
+    """
+    pairs = schedule_rule_pairs(projects, rules)
+    concurrency = max(1, config.batch.llm_concurrency)
+    retrieval = config.retrieval
+    lock = threading.Lock()
+    for project in projects:
+        embedder = create_embedder(retrieval, config.llm.call_timeout_seconds)
+        project.semantic_index = SemanticIndex(project.root, embedder, retrieval.file_types,
+                                               retrieval.max_chunk_lines, retrieval.alpha)
+
+    def run_pair(pair):
+        index, rule_obj, project = pair
+        if cancel_token is not None:
+            cancel_token.check()
+        rule_id = str(rule_obj.get('id', index))
+        logger.info(f"Анализ правила {rule_id} для проекта {project.name}")
+        # Для каждой пары свой экземпляр модели: в нем хранится состояние
+        # проверки правила (правило, зависимости), а индексы проекта общие
+        llm_model = LLMModel(config.llm.model_name, project_root=project.root, cancel_token=cancel_token,
+                             config=config, file_accessor=project.file_accessor,
+                             semantic_index=project.semantic_index)
+        try:
+            record = analyze_rule_obj(rule_obj, llm_model, project.static_results, project.root,
+                                      config.static.max_findings, analysis_version=analysis_version)
+        except AnalysisCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при анализе правила {rule_id} для проекта {project.name}: {e!r}")
+            with lock:
+                project.rule_errors[rule_id] = f"{type(e).__name__}: {e}"
+            return
+        with lock:
+            project.records[rule_id] = record
+
+    logger.info(f"Пакетный анализ: {len(pairs)} пар (правило, проект), "
+                f"одновременных проверок: {concurrency}.")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run_pair, pair) for pair in pairs]
+        try:
+            for future in futures:
+                future.result()
+        except AnalysisCancelled:
+            for future in futures:
+                future.cancel()
+            raise
@@ -0,0 +1,80 @@
+# app/services/cancellation.py
+
+import time
+import threading
+
+# Причины прерывания задачи анализа
+CLIENT_DISCONNECTED = 'client_disconnected'
+DEADLINE_EXCEEDED = 'deadline_exceeded'
+
+
+class AnalysisCancelled(Exception):
+    """Задача анализа прервана: клиент отключился или истекло отведенное время."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LLMCallTimeout(Exception):
+    """Модель не ответила за отведенное на один вызов время. Прерывается только проверка правила."""
+
+    def __init__(self, timeout):
+        super().__init__(f"Модель не ответила за {timeout:.0f} с.")
+        self.timeout = timeout
+
+
+class CancellationToken:
+    """
+    Признак отмены задачи анализа с крайним сроком выполнения. Проверяется
+    в рабочем потоке между правилами, перед вызовами инструментов и при
+    получении каждой порции ответа модели. Функции, зарегистрированные через
+    add_callback(), вызываются в потоке, отменяющем задачу, - так обрывается
+    ожидание ответа модели, не дожидаясь следующей порции.
+    """
+
+    def __init__(self, timeout=None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def cancel(self, reason):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Регистрирует функцию отмены. Если задача уже отменена, функция вызывается сразу."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(DEADLINE_EXCEEDED)
+        return self._event.is_set()
+
+    def remaining(self):
+        """Сколько секунд осталось до крайнего срока (None, если срок не задан)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise AnalysisCancelled(self.reason)
@@ -1,6 +1,9 @@
 import ollama
+import httpx
 import os
 import json
+import time
+import inspect
 from app.core.logger import logger
 from app.core.utils.code_analysis import (
     get_file_content_with_line_numbers,
@@ -8,20 +11,45 @@ from app.core.utils.code_analysis import (
     check_pep8_compliance,
     format_project_tree
 )
+from app.core.utils.file_access import FileAccessor
+from app.core.utils.semantic_search import SemanticIndex, create_embedder, format_semantic_results
 from app.core.config import Config
+from app.core.utils.ollama_client import abortable_client
+from app.services.cancellation import LLMCallTimeout
+
+# Тексты промптов по пути файла: (mtime, текст). Файл перечитывается только
+# после изменения, а не при каждом вызове модели.
+_prompt_cache = {}
 
 class LLMModel:
-    def __init__(self, model_name):
+    def __init__(self, model_name, project_root=None, cancel_token=None, config=None,
+                 file_accessor=None, semantic_index=None):
+        # config, file_accessor и semantic_index передаются, когда несколько
+        # экземпляров работают с одним снимком (пакетный анализ): индексы
+        # строятся один раз на снимок, а не на каждое правило
         self.model_name = model_name
         logger.info(f"LLMModel инициализирован с моделью: {self.model_name}")
-        self.config = Config()
+        self.config = config or Config()
+        self.cancel_token = cancel_token
+        self.call_timeout = self.config.llm.call_timeout_seconds
+        self.project_root = project_root
         self.rule = ""
         self.project_tree = None
+        self.semantic_index = semantic_index
+        self.file_accessor = file_accessor or FileAccessor(project_root or self.config.paths.project_root)
+        self.dependencies = self.empty_dependencies()
+
+    @staticmethod
+    def empty_dependencies():
+        # Файлы и поиски, к которым модель обращалась при проверке правила.
+        # Используются при инкрементальном анализе новой ревизии проекта.
+        return {'paths': [], 'searches': [], 'tool_calls': 0}
 
     def analyze_rule(self, rule):
         self.rule = rule
+        self.dependencies = self.empty_dependencies()
         # Получаем дерево проекта
-        project_tree = format_project_tree()
+        project_tree = format_project_tree(self.project_root)
         self.project_tree = project_tree
 
         # Загрузка системного промпта для первой модели
@@ -38,6 +66,7 @@ class LLMModel:
         available_functions = {
             'file_content': self.file_content,
             'search_files': self.search_files,
+            'semantic_search': self.semantic_search,
             'check_pep8': self.check_pep8
         }
 
@@ -47,23 +76,22 @@ class LLMModel:
         logger.info(f"СООБЩЕНИЯ В КОНТЕКСТЕ 1 МОДЕЛИ: {messages}")
 
         # Запуск первой модели
-        response = ollama.chat(
-            model=self.model_name,
-            messages=messages,
-            tools=tools
-        )
+        response = self.chat(messages, tools=tools)
 
-        logger.info(f"Ответ: {response.message.content}")
+        logger.info(f"Ответ: {response.content}")
         # Обработка вызовов функций
         messages = []
-        if response.message.tool_calls:
-            for tool in response.message.tool_calls:
+        if response.tool_calls:
+            for tool in response.tool_calls:
+                # Оставшиеся вызовы инструментов не выполняются, если задача отменена
+                self.check_cancelled()
                 logger.info(f"Processing tool: {tool}")
                 func_name = tool.function.name
                 func_args = tool.function.arguments
                 func = available_functions.get(func_name)
                 if func:
                     logger.info(f"Вызов функции: {func_name} с аргументами {func_args}")
+                    self.dependencies['tool_calls'] += 1
                     output = func(**func_args)
                     logger.info(f"Вывод функции: {output[:500]}...")  # Логируем первые 500 символов
                     messages.append({'role': 'tool', 'content': output, 'name': func_name})
@@ -74,7 +102,7 @@ class LLMModel:
         else:
             logger.info("Модель не вызвала никаких функций.")
 
-        first_model_output = response.message.content
+        first_model_output = response.content
         logger.info(f"Вывод первой модели: {first_model_output}")
 
         # Запуск второй модели
@@ -99,11 +127,8 @@ class LLMModel:
                                                       f"Если огибок нет, напиши, что огибок нет"})
         messages.append({'role': 'user', 'content': f"Дерево проекта: {self.project_tree}\n\nСтандарт: {self.rule}\n\n"})
         logger.info(f"СООБЩЕНИЯ В КОНТЕКСТЕ 2 МОДЕЛИ: {messages}")
-        response = ollama.chat(
-            model=self.model_name,
-            messages=messages
-        )
-        return response.message.content
+        response = self.chat(messages)
+        return response.content
 
     def run_third_model(self, second_model_output):
         system_prompt = self.load_prompt('third_model_prompt.txt')
@@ -113,61 +138,190 @@ class LLMModel:
         ]
 
         logger.info(f"СООБЩЕНИЯ В КОНТЕКСТЕ 3 МОДЕЛИ: {messages}")
-        response = ollama.chat(
-            model=self.model_name,
-            messages=messages
-        )
+        response = self.chat(messages)
         try:
-            result = json.loads(response.message.content)
+            result = json.loads(response.content)
             logger.info(result)
             return result.get('passed', True)
         except json.JSONDecodeError:
             logger.error("Ответ третьей модели не является валидным JSON.")
             return True  # Считаем, что проверка пройдена, если JSON некорректен
 
+    def check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def chat(self, messages, tools=None):
+        """
+        Вызов модели в потоковом режиме. Ответ собирается из порций, между
+        порциями проверяется крайний срок вызова. При отмене задачи соединение
+        с Ollama обрывается сразу, в том числе во время обработки промпта,
+        и генерация на сервере останавливается. Если модель не уложилась
+        в отведенное время, возбуждается LLMCallTimeout.
+        """
+        self.check_cancelled()
+        timeout = self.call_timeout
+        if self.cancel_token is not None and self.cancel_token.remaining() is not None:
+            timeout = min(timeout, self.cancel_token.remaining())
+        deadline = time.monotonic() + timeout
+
+        content = []
+        tool_calls = []
+        # Таймаут HTTP ограничивает ожидание каждой порции ответа, в том числе первой
+        client, abort = abortable_client(max(timeout, 0.1))
+        if self.cancel_token is not None:
+            self.cancel_token.add_callback(abort)
+        try:
+            with client:
+                stream = client.chat(model=self.model_name, messages=messages, tools=tools, stream=True)
+                try:
+                    for chunk in stream:
+                        content.append(chunk.message.content or '')
+                        tool_calls.extend(chunk.message.tool_calls or [])
+                        self.check_cancelled()
+                        if time.monotonic() > deadline:
+                            logger.warning(f"Вызов модели превысил {timeout:.1f} с и прерван.")
+                            raise LLMCallTimeout(timeout)
+                finally:
+                    stream.close()
+        except httpx.TimeoutException:
+            # Если истек срок всей задачи, причиной прерывания указывается он
+            self.check_cancelled()
+            logger.warning(f"Модель не ответила за {timeout:.1f} с, вызов прерван.")
+            raise LLMCallTimeout(timeout)
+        except httpx.TransportError:
+            # Соединение оборвано при отмене задачи
+            self.check_cancelled()
+            raise
+        finally:
+            if self.cancel_token is not None:
+                self.cancel_token.remove_callback(abort)
+        return ollama.Message(role='assistant', content=''.join(content), tool_calls=tool_calls or None)
+
     def load_prompt(self, filename):
         prompt_path = os.path.join('app', 'llm_prompts', filename)
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        mtime = os.path.getmtime(prompt_path)
+        cached = _prompt_cache.get(prompt_path)
+        if cached is None or cached[0] != mtime:
+            with open(prompt_path, 'r', encoding='utf-8') as f:
+                cached = (mtime, f.read())
+            _prompt_cache[prompt_path] = cached
+        return cached[1]
 
     def get_function_definition(self, name, func):
+        description, _ = self.parse_docstring(func)
         return {
             'type': 'function',
             'function': {
                 'name': name,
-                'description': func.__doc__,
+                'description': description,
                 'parameters': self.get_function_parameters(func),
             }
         }
 
+    @staticmethod
+    def parse_docstring(func):
+        """Разделяет докстринг на описание функции и описания параметров (:param name: ...)."""
+        description = []
+        params = {}
+        for line in (func.__doc__ or '').strip().splitlines():
+            line = line.strip()
+            if line.startswith(':param '):
+                name, _, text = line[len(':param '):].partition(':')
+                params[name.strip()] = text.strip()
+            elif line:
+                description.append(line)
+        return ' '.join(description), params
+
     def get_function_parameters(self, func):
-        # Используем аннотации функций для определения параметров
+        # Используем аннотации и значения по умолчанию для определения параметров
+        json_types = {list: 'array', int: 'integer', str: 'string', bool: 'boolean', float: 'number'}
+        _, descriptions = self.parse_docstring(func)
+        signature = inspect.signature(func)
         params = {}
-        for param_name, param in func.__annotations__.items():
-            if param_name == 'return':
-                continue
-            params[param_name] = {'type': 'string', 'description': ''}
+        required = []
+        for param_name, param in signature.parameters.items():
+            json_type = json_types.get(param.annotation, 'string')
+            params[param_name] = {'type': json_type, 'description': descriptions.get(param_name, '')}
+            if json_type == 'array':
+                params[param_name]['items'] = {'type': 'string'}
+            if param.default is inspect.Parameter.empty:
+                required.append(param_name)
         return {
             'type': 'object',
             'properties': params,
+            'required': required,
         }
 
     # Реализация функций, которые может вызывать модель
 
-    def file_content(self, paths: list, extension_filter: str = None, max_lines_per_file: int = 600) -> str:
+    def file_content(self, paths: list, extension_filter: str = None, max_lines_per_file: int = 600,
+                     start_line: int = None, end_line: int = None, symbol: str = None) -> str:
         """
         Получить содержимое файлов по заданным путям с нумерацией строк и форматированием.
+        Можно запросить только нужный диапазон строк или конкретный класс/функцию.
+        :param paths: Пути к файлам или каталогам относительно корня проекта.
+        :param extension_filter: Расширение файлов для вывода, например .py.
+        :param max_lines_per_file: Максимум строк, выводимых из одного файла.
+        :param start_line: Первая строка диапазона (нумерация с 1).
+        :param end_line: Последняя строка диапазона включительно.
+        :param symbol: Класс или функция для вывода, например "class Foo", "def bar" или "Foo.bar".
         """
-        return get_file_content_with_line_numbers(paths, extension_filter, max_lines_per_file)
+        if isinstance(paths, str):
+            paths = [paths]
+        self.dependencies['paths'].extend(paths)
+        tools_config = self.config.tools
+        return get_file_content_with_line_numbers(
+            paths, extension_filter, max_lines_per_file, root=self.project_root,
+            start_line=start_line, end_line=end_line, symbol=symbol,
+            max_total_lines=tools_config.max_total_lines, max_total_bytes=tools_config.max_total_bytes,
+            accessor=self.file_accessor
+        )
 
     def search_files(self, terms: list, max_results: int = 5, file_types: list = None) -> str:
         """
         Поиск термина в файлах проекта с выводом контекста и нумерацией строк.
+        :param terms: Искомые термины.
+        :param max_results: Максимум совпадений на термин.
+        :param file_types: Расширения файлов для поиска, например [".py"].
         """
-        return search_in_files(terms, max_results,  file_types)
+        matched_paths = set()
+        output = search_in_files(terms, max_results,  file_types, root=self.project_root, matched_paths=matched_paths)
+        self.dependencies['paths'].extend(sorted(matched_paths))
+        self.dependencies['searches'].append({'terms': list(terms), 'file_types': file_types})
+        return output
+
+    def semantic_search(self, query: str, top_k: int = 5) -> str:
+        """
+        Поиск фрагментов кода (функций, классов, участков файлов), близких к запросу по смыслу и по словам.
+        :param query: Описание искомого кода на естественном языке или ключевые слова.
+        :param top_k: Количество возвращаемых фрагментов.
+        """
+        if self.semantic_index is None:
+            retrieval = self.config.retrieval
+            self.semantic_index = SemanticIndex(
+                self.project_root or self.config.paths.project_root,
+                create_embedder(retrieval, self.call_timeout),
+                retrieval.file_types, retrieval.max_chunk_lines, retrieval.alpha
+            )
+        try:
+            results = self.semantic_index.ensure_built(self.cancel_token).search(query, int(top_k),
+                                                                                 self.cancel_token)
+        except httpx.TimeoutException:
+            self.check_cancelled()
+            logger.warning(f"Модель эмбеддингов не ответила за {self.call_timeout:.1f} с, вызов прерван.")
+            raise LLMCallTimeout(self.call_timeout)
+        self.dependencies['paths'].extend(sorted({chunk.path for chunk, _ in results}))
+        # Плотный поиск может найти файл без единого слова запроса, поэтому
+        # результат зависит от любого файла индексируемых типов
+        self.dependencies['searches'].append({'terms': None, 'file_types': self.config.retrieval.file_types})
+        return format_semantic_results(results)
 
     def check_pep8(self, max_errors: int = 5) -> str:
         """
         Проверка кода на соответствие PEP8 с выводом ошибок и нумерацией строк.
+        :param max_errors: Максимум выводимых ошибок.
         """
-        return check_pep8_compliance(max_errors)
+        # Результат flake8 зависит от любого Python-файла проекта
+        self.dependencies['searches'].append({'terms': None, 'file_types': ['.py']})
+        return check_pep8_compliance(int(max_errors), root=self.project_root)
@@ -0,0 +1,84 @@
+# app/services/rule_analysis.py
+
+from app.core.logger import logger
+from app.core.analysis.static_checkers import evaluate_rule, FAILED
+from app.core.utils.snapshot import needs_reanalysis
+from app.services.cancellation import LLMCallTimeout
+
+
+def analyze_rule_obj(rule_obj, llm_model, static_results, project_root, max_findings=10,
+                     previous_record=None, diff=None, analysis_version=None):
+    """
+    Проверяет одно правило из rules.json.
+
+    Сначала применяются детерминированные проверки, сопоставленные правилу.
+    Модель вызывается только для части правила без проверок (llm_rule) или
+    для всего правила, если результат проверок неоднозначен. Если правило
+    уже проверялось в предыдущем снимке и изменения его не затронули,
+    вердикт модели переносится без повторного вызова.
+    """
+    rule = rule_obj['rule']
+    static = evaluate_rule(rule_obj, static_results, project_root, max_findings)
+
+    llm_rule = rule
+    if static is not None and not static['ambiguous']:
+        llm_rule = rule_obj.get('llm_rule')
+    elif static is not None:
+        logger.info("Результат статических проверок неоднозначен, правило проверяется моделью целиком.")
+
+    llm_record = None
+    if llm_rule:
+        previous_llm = previous_record.get('llm') if previous_record else None
+        if previous_llm and diff is not None and not needs_reanalysis(
+                previous_llm, llm_rule, llm_model.model_name, diff, project_root, analysis_version):
+            logger.info("Правило не затронуто изменениями, вердикт модели перенесен из предыдущего снимка.")
+            llm_record = dict(previous_llm, carried_over=True)
+        else:
+            logger.info(f"Анализ правила моделью: {llm_rule}")
+            llm_record = {
+                'rule': llm_rule,
+                'model': llm_model.model_name,
+                'analysis_version': analysis_version,
+                'carried_over': False,
+                'timed_out': False,
+            }
+            try:
+                analysis_result = llm_model.analyze_rule(llm_rule)
+                llm_record.update(passed=not analysis_result, report=analysis_result,
+                                  dependencies=llm_model.dependencies)
+            except LLMCallTimeout as e:
+                # Правило считается непроверенным; без зависимостей вердикт
+                # не переносится, и при следующем анализе правило проверяется снова
+                logger.warning(f"Проверка правила моделью прервана по таймауту: {e}")
+                llm_record.update(passed=False, dependencies=None, timed_out=True,
+                                  report=f"### Проверка правила моделью не завершена\n\n{e}")
+    else:
+        logger.info("Правило полностью проверено статическими проверками, модель не вызывается.")
+
+    reports = [part['report'] for part in (static, llm_record) if part and part['report']]
+    return {
+        'id': rule_obj.get('id'),
+        'rule': rule,
+        'passed': (static is None or static['status'] != FAILED) and (llm_record is None or llm_record['passed']),
+        'report': '\n\n'.join(reports) if reports else None,
+        'static': static,
+        'llm': llm_record,
+    }
+
+
+def iter_rule_records(rules, llm_model, static_results, project_root, max_findings=10,
+                      previous_snapshot=None, diff=None, cancel_token=None, analysis_version=None):
+    """
+    Последовательно проверяет правила и отдает пары (id правила, запись)
+    по мере готовности каждого результата. При отмене задачи следующее
+    правило не начинается, а текущее прерывается вместе с вызовом модели.
+    """
+    for index, rule_obj in enumerate(rules, start=1):
+        if cancel_token is not None:
+            cancel_token.check()
+        rule_id = str(rule_obj.get('id', index))
+        logger.info(f"Анализ правила: {rule_obj['rule']}")
+        previous_record = previous_snapshot['rules'].get(rule_id) if previous_snapshot else None
+        yield rule_id, analyze_rule_obj(rule_obj, llm_model, static_results, project_root, max_findings,
+                                        previous_record=previous_record, diff=diff,
+                                        analysis_version=analysis_version)
@@ -0,0 +1,191 @@
+# app/services/single_flight.py
+
+import time
+import asyncio
+from app.core.logger import logger
+from app.services.cancellation import AnalysisCancelled, CancellationToken, CLIENT_DISCONNECTED
+
+_END = object()
+
+
+class AnalysisJob:
+    """
+    Задача анализа, к которой могут подключаться несколько запросов.
+    Результаты правил накапливаются по мере готовности, каждый подписчик
+    получает их все, начиная с первого. Когда отключается последний
+    подписчик, незавершенная задача отменяется.
+    """
+
+    def __init__(self, key, snapshot_id, cancel_token=None):
+        self.key = key
+        self.snapshot_id = snapshot_id
+        self.cancel_token = cancel_token or CancellationToken()
+        self.subscribers = 0
+        self.records = []
+        self.error = None
+        self.preparation_error = None
+        self.done = False
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.task = None
+        self._prepared = asyncio.Event()
+        self._condition = asyncio.Condition()
+
+    @property
+    def duration(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def cancelled(self):
+        return isinstance(self.error, AnalysisCancelled)
+
+    @property
+    def completed_rules(self):
+        return [rule_id for rule_id, _ in self.records]
+
+    def attach(self):
+        self.subscribers += 1
+
+    def detach(self):
+        """
+        Отключает подписчика. Если подписчиков не осталось, а задача еще
+        выполняется, она отменяется: ее результат больше никто не получит.
+        """
+        self.subscribers -= 1
+        if self.subscribers <= 0 and not self.done:
+            logger.info(f"Все клиенты задачи анализа {self.snapshot_id} отключились, задача отменяется.")
+            self.cancel_token.cancel(CLIENT_DISCONNECTED)
+
+    async def wait_prepared(self):
+        """
+        Дожидается окончания подготовки задачи (распаковка, статические проверки).
+        Если подготовка завершилась ошибкой, ошибка пробрасывается.
+        """
+        await self._prepared.wait()
+        if self.preparation_error is not None:
+            raise self.preparation_error
+
+    async def publish(self, item):
+        async with self._condition:
+            self.records.append(item)
+            self._condition.notify_all()
+
+    async def finish(self, error=None):
+        async with self._condition:
+            self.error = error
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._condition.notify_all()
+        self._prepared.set()
+
+    async def stream(self):
+        """
+        Асинхронно отдает пары (id правила, запись) по мере их появления.
+        """
+        position = 0
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: len(self.records) > position or self.done)
+            while position < len(self.records):
+                yield self.records[position]
+                position += 1
+            if self.done and position >= len(self.records):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def result(self):
+        """
+        Дожидается завершения задачи и возвращает все записи.
+        """
+        async for _ in self.stream():
+            pass
+        return list(self.records)
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых запросов: пока задача с данным ключом выполняется,
+    новые запросы подключаются к ней, а не запускают анализ заново.
+    Завершенные задачи хранятся result_ttl секунд, чтобы почти одновременные
+    повторы получили готовый результат.
+    """
+
+    def __init__(self, result_ttl):
+        self.result_ttl = result_ttl
+        self._inflight = {}
+        self._completed = {}
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key, (_, expires_at) in list(self._completed.items()):
+            if expires_at <= now:
+                del self._completed[key]
+
+    def get(self, key):
+        """
+        Возвращает выполняющуюся или недавно завершенную задачу с данным ключом.
+        Отмененная, но еще не остановившаяся задача не возвращается.
+        """
+        self._purge_expired()
+        job = self._inflight.get(key)
+        if job is not None and job.cancel_token.cancelled:
+            job = None
+        if job is None and key in self._completed:
+            job = self._completed[key][0]
+        return job
+
+    def start(self, key, snapshot_id, prepare, on_finally=None, timeout=None):
+        """
+        Регистрирует и запускает задачу. Регистрация происходит сразу, поэтому
+        запросы, пришедшие во время подготовки, тоже подключаются к задаче.
+
+        prepare(job) - корутина, которая готовит проект и возвращает итератор
+        пар (id правила, запись); результаты извлекаются из него по одному
+        в рабочем потоке. Итератор должен проверять job.cancel_token, срок
+        которого истекает через timeout секунд. on_finally() вызывается
+        при завершении задачи с ошибкой, а для успешной задачи - когда ее
+        результат покидает кэш, чтобы ресурсы задачи (рабочий каталог)
+        оставались доступны, пока результат отдается повторным запросам.
+        """
+        job = AnalysisJob(key, snapshot_id, CancellationToken(timeout))
+        self._inflight[key] = job
+        job.task = asyncio.create_task(self._run(job, prepare, on_finally))
+        return job
+
+    async def _run(self, job, prepare, on_finally):
+        try:
+            records = await prepare(job)
+            job.cancel_token.check()
+            job._prepared.set()
+            while True:
+                item = await asyncio.to_thread(next, records, _END)
+                if item is _END:
+                    break
+                await job.publish(item)
+            await job.finish()
+        except AnalysisCancelled as e:
+            logger.warning(f"Задача анализа {job.snapshot_id} прервана ({e.reason}), "
+                           f"проверено правил: {len(job.records)}.")
+            if not job._prepared.is_set():
+                job.preparation_error = e
+            await job.finish(error=e)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении задачи анализа {job.snapshot_id}: {e!r}")
+            if not job._prepared.is_set():
+                job.preparation_error = e
+            await job.finish(error=e)
+        finally:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if job.error is None and self.result_ttl > 0:
+                self._completed[job.key] = (job, time.monotonic() + self.result_ttl)
+                asyncio.get_running_loop().call_later(self.result_ttl, self._expire, job, on_finally)
+            elif on_finally is not None:
+                on_finally()
+
+    def _expire(self, job, on_finally):
+        if self._completed.get(job.key, (None, None))[0] is job:
+            del self._completed[job.key]
+        if on_finally is not None:
+            on_finally()
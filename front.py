@@ -5,6 +5,9 @@ from io import BytesIO
 
 # Обновленный эндпоинт FastAPI
 API_URL = "http://localhost:8000/api/v1/upload"
+# Время ожидания отчета. Если клиент перестает ждать, соединение закрывается,
+# и сервер прекращает анализ
+REQUEST_TIMEOUT = 1800
 
 
 def upload_and_analyze(file):
@@ -15,7 +18,12 @@ def upload_and_analyze(file):
         # Отправляем файл на FastAPI
         with open(file.name, "rb") as f:  # `file` - это объект File из Gradio
             files = {'file': (os.path.basename(file.name), f, 'application/zip')}
-            response = requests.post(API_URL, files=files)
+            response = requests.post(API_URL, files=files, timeout=(10, REQUEST_TIMEOUT))
+
+        if response.status_code == 504:
+            completed = response.json()['detail'].get('completed_rules', [])
+            return (f"❌ Анализ прерван по превышению времени. "
+                    f"Проверенные правила: {', '.join(completed) or 'нет'}"), None
 
         if response.status_code != 200:
             return f"❌ Ошибка при обработке файла: {response.text}", None
@@ -30,6 +38,8 @@ def upload_and_analyze(file):
 
         return "✅ Файл успешно обработан. Скачать отчет ниже.", pdf_file
 
+    except requests.Timeout:
+        return "❌ Превышено время ожидания отчета.", None
     except Exception as e:
         return f"❌ Произошла ошибка: {str(e)}", None
 
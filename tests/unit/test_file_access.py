@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from app.core.utils import file_access
+from app.core.utils.file_access import FileAccessor, LineIndex, ReadBudget
+
+SOURCE = ('class Service:\n'
+          '    def start(self):\n'
+          '        return 1\n'
+          '\n'
+          '\n'
+          '@decorator\n'
+          'def helper():\n'
+          '    return 2\n')
+
+
+def _write(root, relative_path, content):
+    path = os.path.join(root, relative_path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    return path
+
+
+@pytest.mark.parametrize('content', ['', 'a', 'a\n', 'a\nbb\n', 'a\nbb', '\n\n', 'строка\nещё\n'])
+@pytest.mark.parametrize('chunk_bytes', [1, 2, 3, 1024])
+def test__LineIndex__offsets_across_scan_chunks(tmp_path, monkeypatch, content, chunk_bytes):
+    monkeypatch.setattr(file_access, 'SCAN_CHUNK_BYTES', chunk_bytes)
+    index = LineIndex(_write(str(tmp_path), 'f.txt', content))
+    lines = content.split('\n') if content else []
+    if content.endswith('\n'):
+        lines.pop()
+
+    assert index.line_count == len(lines)
+    assert index.read_lines(1, index.line_count) == lines
+    if lines:
+        assert index.read_lines(index.line_count, index.line_count) == lines[-1:]
+
+
+def test__LineIndex__is_stale(tmp_path):
+    path = _write(str(tmp_path), 'f.txt', 'a\n')
+    index = LineIndex(path)
+    assert not index.is_stale()
+
+    _write(str(tmp_path), 'f.txt', 'a\nb\n')
+
+    assert index.is_stale()
+
+
+def test__ReadBudget__fit_and_consume(tmp_path):
+    index = LineIndex(_write(str(tmp_path), 'f.txt', 'aaa\nbbb\nccc\n'))
+    budget = ReadBudget(max_lines=10, max_bytes=8)
+
+    assert budget.fit(index, 1, 3) == 2
+    budget.consume(index, 1, 2)
+    assert budget.exhausted
+
+
+def test__FileAccessor__line_range(tmp_path):
+    _write(str(tmp_path), 'service.py', SOURCE)
+    accessor = FileAccessor(str(tmp_path))
+
+    output = accessor.read_numbered('service.py', start_line=2, end_line=3)
+
+    assert output == "```\n2\t    def start(self):\n3\t        return 1\n```"
+
+
+def test__FileAccessor__symbols(tmp_path):
+    _write(str(tmp_path), 'service.py', SOURCE)
+    accessor = FileAccessor(str(tmp_path))
+
+    assert accessor.symbol_range('service.py', 'Service.start') == (2, 3)
+    assert accessor.symbol_range('service.py', 'def  helper') == (6, 8)
+    assert accessor.read_numbered('service.py', symbol='class Service').startswith("```\n1\tclass Service:")
+    assert accessor.read_numbered('service.py', symbol='missing') is None
+
+
+def test__FileAccessor__truncated_output(tmp_path):
+    _write(str(tmp_path), 'service.py', SOURCE)
+    accessor = FileAccessor(str(tmp_path))
+
+    output = accessor.read_numbered('service.py', max_lines=2)
+
+    assert "*...Показаны строки 1-2 из 8, вывод сокращен." in output
+
+
+def test__FileAccessor__out_of_range_requests(tmp_path):
+    _write(str(tmp_path), 'service.py', SOURCE)
+    accessor = FileAccessor(str(tmp_path))
+
+    assert "Файл содержит 8 строк" in accessor.read_numbered('service.py', start_line=20)
+    reversed_range = accessor.read_numbered('service.py', start_line=5, end_line=2)
+    assert "end_line (2) меньше start_line (5)" in reversed_range
+    assert "Файл содержит 8 строк" in reversed_range
+
+
+def test__FileAccessor__reloads_changed_file(tmp_path):
+    _write(str(tmp_path), 'f.txt', 'old\n')
+    accessor = FileAccessor(str(tmp_path))
+    assert accessor.read_numbered('f.txt') == "```\n1\told\n```"
+
+    _write(str(tmp_path), 'f.txt', 'new line\n')
+
+    assert accessor.read_numbered('f.txt') == "```\n1\tnew line\n```"
@@ -0,0 +1,88 @@
+import json
+
+from app.core.utils.json_report import (
+    BATCH_SUMMARY_SCHEMA,
+    RULE_RESULT_SCHEMA,
+    SUMMARY_SCHEMA,
+    batch_summary,
+    build_batch_report,
+    build_json_report,
+    rule_result,
+    summary,
+    to_ndjson,
+)
+
+
+def _record(passed=True, static=None, llm=None, report=None):
+    return {'id': 1, 'rule': 'rule text', 'passed': passed, 'report': report, 'static': static, 'llm': llm}
+
+
+def _assert_required(document, schema):
+    missing = [key for key in schema['required'] if key not in document]
+    assert not missing, missing
+
+
+def test__rule_result__sources_and_findings():
+    static = {'findings': [{'checker': 'no_print', 'path': 'a.py', 'line': 3, 'message': "print", 'extra': 1}]}
+    llm = {'carried_over': True, 'timed_out': False}
+
+    result = rule_result('1', _record(passed=False, static=static, llm=llm, report="### report"))
+
+    _assert_required(result, RULE_RESULT_SCHEMA)
+    assert result['sources'] == ['static', 'llm']
+    assert result['findings'] == [{'checker': 'no_print', 'path': 'a.py', 'line': 3, 'message': "print"}]
+    assert result['carried_over'] and not result['timed_out']
+
+
+def test__summary__completed():
+    results = [rule_result('1', _record()), rule_result('2', _record(passed=False))]
+
+    document = summary('proj', 'snap', results, duration=1.23456, rules_total=2)
+
+    _assert_required(document, SUMMARY_SCHEMA)
+    assert document['status'] == 'completed'
+    assert not document['passed']
+    assert document['failed_rules'] == ['2']
+    assert document['duration_seconds'] == 1.235
+
+
+def test__summary__cancelled_and_failed():
+    results = [rule_result('1', _record())]
+
+    cancelled = summary('proj', 'snap', results, rules_total=3, cancel_reason='deadline_exceeded')
+    failed = summary('proj', 'snap', results, rules_total=3, error="ResponseError: boom")
+    incomplete = summary('proj', 'snap', results, rules_total=3)
+
+    assert (cancelled['status'], cancelled['cancel_reason']) == ('cancelled', 'deadline_exceeded')
+    assert (failed['status'], failed['error']) == ('failed', "ResponseError: boom")
+    assert failed['status'] in SUMMARY_SCHEMA['properties']['status']['enum']
+    assert not cancelled['passed'] and not failed['passed'] and not incomplete['passed']
+    assert cancelled['completed_rules'] == ['1'] and cancelled['rules_total'] == 3
+
+
+def test__batch_summary__errors_and_failures():
+    passed = build_json_report('ok', 's1', [rule_result('1', _record())], rules_total=1)
+    failed = build_json_report('bad', 's2', [rule_result('1', _record(passed=False))], rules_total=1)
+    errors = [{'project': 'broken', 'error': "bad zip"}, {'project': 'ok', 'rule': '2', 'error': "boom"}]
+
+    document = batch_summary([passed, failed], errors)
+
+    _assert_required(document, BATCH_SUMMARY_SCHEMA)
+    assert document['projects_total'] == 3
+    assert document['failed_projects'] == ['ok', 'bad']
+    assert document['rule_failures'] == {'1': ['bad']}
+    assert not document['passed']
+
+
+def test__build_batch_report__cancelled():
+    report = build_batch_report([], [], duration=2, cancel_reason='client_disconnected')
+
+    assert report['summary']['status'] == 'cancelled'
+    assert report['summary']['cancel_reason'] == 'client_disconnected'
+
+
+def test__to_ndjson__single_line():
+    line = to_ndjson({'type': 'rule', 'report': "строка 1\nстрока 2"})
+
+    assert line.endswith('\n') and line.count('\n') == 1
+    assert json.loads(line)['report'] == "строка 1\nстрока 2"
@@ -0,0 +1,21 @@
+from app.core.utils.lru_cache import LRUCache
+
+
+def test__LRUCache__evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+
+    cache['c'] = 3
+
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+
+def test__LRUCache__default():
+    cache = LRUCache(1)
+
+    assert cache.get('missing') is None
+    assert cache.get('missing', 0) == 0
@@ -0,0 +1,114 @@
+import os
+
+import nltk
+import numpy as np
+import pytest
+
+from app.core.utils.semantic_search import HashingEmbedder, SemanticIndex, chunk_python, chunk_text
+from app.services.cancellation import AnalysisCancelled, CancellationToken, CLIENT_DISCONNECTED
+
+
+def _has_punkt():
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+        return True
+    except LookupError:
+        return False
+
+
+# BM25-часть индекса токенизирует фрагменты через nltk
+requires_punkt = pytest.mark.skipif(not _has_punkt(), reason="Нет данных nltk punkt_tab")
+
+SOURCE = ('"""Профили пользователей."""\n'
+          'import json\n\n\n'
+          'def load_user_profile(user_id):\n'
+          '    return json.loads(read_profile_file(user_id))\n\n\n'
+          'class PaymentGateway:\n'
+          '    def charge_card(self, amount):\n'
+          '        return amount\n')
+
+
+class FailingEmbedder:
+    name = 'failing-test-embedder'
+    fallback_dim = 64
+
+    def __init__(self, cancel_token=None):
+        self.cancel_token = cancel_token
+
+    def embed(self, texts, cancel_token=None):
+        if self.cancel_token is not None:
+            self.cancel_token.cancel(CLIENT_DISCONNECTED)
+        raise ConnectionError("embedding model unavailable")
+
+
+def _project(root):
+    with open(os.path.join(root, 'profiles.py'), 'w', encoding='utf-8') as f:
+        f.write(SOURCE)
+    with open(os.path.join(root, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write("Сервис платежей\n")
+    return str(root)
+
+
+def test__HashingEmbedder__deterministic():
+    embedder = HashingEmbedder(dim=32)
+
+    first = embedder.embed(["load_user_profile", "charge card"])
+    second = HashingEmbedder(dim=32).embed(["load_user_profile", "charge card"])
+
+    assert first.shape == (2, 32)
+    assert np.array_equal(first, second)
+    assert embedder.name == 'hashing-32'
+
+
+def test__HashingEmbedder__identifier_parts_overlap():
+    vectors = HashingEmbedder(dim=256).embed(["load_user_profile", "user profile", "charge card"])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test__chunk_python__functions_and_classes():
+    chunks = chunk_python('profiles.py', SOURCE)
+
+    assert [(c.name, c.start_line, c.end_line) for c in chunks] == [
+        (None, 1, 4), ('load_user_profile', 5, 6), ('PaymentGateway', 9, 11)
+    ]
+
+
+def test__chunk_python__syntax_error_falls_back_to_windows():
+    chunks = chunk_python('broken.py', 'def broken(:\n    pass\n', max_chunk_lines=80)
+
+    assert [(c.name, c.start_line, c.end_line) for c in chunks] == [(None, 1, 2)]
+    assert [c.start_line for c in chunk_text('a.txt', 'a\nb\nc\nd\ne\n', max_chunk_lines=4)] == [1, 4]
+
+
+@requires_punkt
+def test__SemanticIndex__hybrid_search(tmp_path):
+    index = SemanticIndex(_project(tmp_path), HashingEmbedder(dim=256), ['.py', '.md'], alpha=0.5)
+
+    results = index.ensure_built().search("load user profile", top_k=2)
+
+    assert results[0][0].name == 'load_user_profile'
+    assert results[0][0].path == 'profiles.py'
+
+
+@requires_punkt
+def test__SemanticIndex__fallback_uses_configured_dim(tmp_path):
+    index = SemanticIndex(_project(tmp_path), FailingEmbedder(), ['.py'])
+
+    index.ensure_built()
+
+    assert isinstance(index.embedder, HashingEmbedder)
+    assert index.embedder.dim == 64
+    assert index.matrix.shape[1] == 64
+
+
+def test__SemanticIndex__cancelled_build_is_not_replaced_by_fallback(tmp_path):
+    token = CancellationToken()
+    index = SemanticIndex(_project(tmp_path), FailingEmbedder(token), ['.py'])
+
+    with pytest.raises(AnalysisCancelled):
+        index.ensure_built(token)
+
+    assert not index.built
+    assert isinstance(index.embedder, FailingEmbedder)
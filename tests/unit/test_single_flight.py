@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.cancellation import AnalysisCancelled, CLIENT_DISCONNECTED
+from app.services.single_flight import SingleFlight
+
+
+def _prepare(records, started=None, release=None):
+    async def prepare(job):
+        def iterate():
+            for record in records:
+                if release is not None:
+                    release.wait(5)
+                job.cancel_token.check()
+                yield record
+        if started is not None:
+            started.append(job.snapshot_id)
+        return iterate()
+    return prepare
+
+
+def test__SingleFlight__same_key_joins_running_job():
+    async def scenario():
+        flight = SingleFlight(result_ttl=0)
+        started = []
+        release = threading.Event()
+        job = flight.start('key', 'first', _prepare([('1', 'a'), ('2', 'b')], started, release))
+        joined = flight.get('key')
+        release.set()
+        return job, joined, await job.result(), started
+
+    job, joined, records, started = asyncio.run(scenario())
+
+    assert joined is job
+    assert records == [('1', 'a'), ('2', 'b')]
+    assert started == ['first']
+
+
+def test__SingleFlight__completed_job_cached_for_ttl():
+    released = []
+
+    async def scenario():
+        flight = SingleFlight(result_ttl=0.05)
+        job = flight.start('key', 'first', _prepare([('1', 'a')]), on_finally=lambda: released.append(True))
+        await job.result()
+        await asyncio.sleep(0)
+        cached = flight.get('key')
+        released_before_ttl = list(released)
+        await asyncio.sleep(0.1)
+        return job, cached, released_before_ttl, flight.get('key')
+
+    job, cached, released_before_ttl, expired = asyncio.run(scenario())
+
+    assert cached is job
+    assert released_before_ttl == []
+    assert released == [True]
+    assert expired is None
+
+
+def test__AnalysisJob__last_subscriber_cancels_job():
+    async def scenario():
+        flight = SingleFlight(result_ttl=0)
+        release = threading.Event()
+        job = flight.start('key', 'first', _prepare([('1', 'a'), ('2', 'b')], release=release))
+        job.attach()
+        job.attach()
+        job.detach()
+        still_running = not job.cancel_token.cancelled
+        job.detach()
+        skipped = flight.get('key')
+        release.set()
+        with pytest.raises(AnalysisCancelled) as error:
+            await job.result()
+        return still_running, skipped, error.value.reason
+
+    still_running, skipped, reason = asyncio.run(scenario())
+
+    assert still_running
+    assert skipped is None
+    assert reason == CLIENT_DISCONNECTED
+
+
+def test__AnalysisJob__error_keeps_finished_records():
+    def records():
+        yield '1', 'a'
+        raise RuntimeError('boom')
+
+    async def prepare(job):
+        return records()
+
+    async def scenario():
+        flight = SingleFlight(result_ttl=10)
+        job = flight.start('key', 'first', prepare)
+        with pytest.raises(RuntimeError):
+            await job.result()
+        return job, flight.get('key')
+
+    job, cached = asyncio.run(scenario())
+
+    assert job.completed_rules == ['1']
+    assert cached is None
+
+
+def test__AnalysisJob__preparation_error():
+    async def prepare(job):
+        raise ValueError('bad archive')
+
+    async def scenario():
+        job = SingleFlight(result_ttl=0).start('key', 'first', prepare)
+        with pytest.raises(ValueError):
+            await job.wait_prepared()
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import os
+import time
+
+from app.core.utils.snapshot import SnapshotStore, build_manifest, diff_manifests, needs_reanalysis
+
+
+def _llm_record(paths=(), searches=(), tool_calls=1, **overrides):
+    record = {
+        'rule': 'rule text',
+        'model': 'model',
+        'analysis_version': 'v1',
+        'dependencies': {'paths': list(paths), 'searches': list(searches), 'tool_calls': tool_calls},
+    }
+    record.update(overrides)
+    return record
+
+
+def _write(root, relative_path, content):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def test__build_manifest__skips_excluded_dirs(tmp_path):
+    _write(tmp_path, 'src/a.py', 'a = 1\n')
+    _write(tmp_path, '.git/config', '')
+    _write(tmp_path, 'src/__pycache__/a.pyc', '')
+
+    manifest = build_manifest(str(tmp_path))
+
+    assert list(manifest) == ['src/a.py']
+
+
+def test__diff_manifests__added_removed_modified():
+    diff = diff_manifests({'a.py': '1', 'b.py': '2', 'c.py': '3'}, {'a.py': '1', 'b.py': '20', 'd.py': '4'})
+
+    assert diff.added == {'d.py'}
+    assert diff.removed == {'c.py'}
+    assert diff.modified == {'b.py'}
+    assert diff.changed == {'b.py', 'c.py', 'd.py'}
+    assert diff.tree_changed
+
+
+def test__diff_manifests__only_modified_keeps_tree():
+    diff = diff_manifests({'a.py': '1'}, {'a.py': '2'})
+
+    assert not diff.tree_changed
+
+
+def test__needs_reanalysis__unchanged_project(tmp_path):
+    diff = diff_manifests({'a.py': '1'}, {'a.py': '1'})
+
+    assert not needs_reanalysis(_llm_record(), 'rule text', 'model', diff, str(tmp_path), 'v1')
+
+
+def test__needs_reanalysis__rule_model_or_version_changed(tmp_path):
+    diff = diff_manifests({}, {})
+
+    assert needs_reanalysis(_llm_record(), 'other rule', 'model', diff, str(tmp_path), 'v1')
+    assert needs_reanalysis(_llm_record(), 'rule text', 'other model', diff, str(tmp_path), 'v1')
+    assert needs_reanalysis(_llm_record(), 'rule text', 'model', diff, str(tmp_path), 'v2')
+
+
+def test__needs_reanalysis__timed_out_record(tmp_path):
+    diff = diff_manifests({}, {})
+
+    assert needs_reanalysis(_llm_record(dependencies=None), 'rule text', 'model', diff, str(tmp_path), 'v1')
+
+
+def test__needs_reanalysis__read_path_changed(tmp_path):
+    diff = diff_manifests({'src/a.py': '1', 'src/b.py': '1'}, {'src/a.py': '2', 'src/b.py': '1'})
+
+    assert needs_reanalysis(_llm_record(paths=['src']), 'rule text', 'model', diff, str(tmp_path), 'v1')
+    assert needs_reanalysis(_llm_record(paths=['src/a.py']), 'rule text', 'model', diff, str(tmp_path), 'v1')
+    assert not needs_reanalysis(_llm_record(paths=['src/b.py']), 'rule text', 'model', diff, str(tmp_path), 'v1')
+
+
+def test__needs_reanalysis__search_term_in_changed_file(tmp_path):
+    _write(tmp_path, 'a.py', 'print("x")\n')
+    diff = diff_manifests({'a.py': '1'}, {'a.py': '2'})
+    found = _llm_record(searches=[{'terms': ['PRINT'], 'file_types': ['.py']}])
+    missed = _llm_record(searches=[{'terms': ['logging'], 'file_types': ['.py']}])
+    other_type = _llm_record(searches=[{'terms': ['print'], 'file_types': ['.md']}])
+
+    assert needs_reanalysis(found, 'rule text', 'model', diff, str(tmp_path), 'v1')
+    assert not needs_reanalysis(missed, 'rule text', 'model', diff, str(tmp_path), 'v1')
+    assert not needs_reanalysis(other_type, 'rule text', 'model', diff, str(tmp_path), 'v1')
+
+
+def test__needs_reanalysis__whole_project_search_on_removed_file(tmp_path):
+    diff = diff_manifests({'a.py': '1', 'b.py': '1'}, {'a.py': '1'})
+    record = _llm_record(searches=[{'terms': None, 'file_types': ['.py']}])
+
+    assert needs_reanalysis(record, 'rule text', 'model', diff, str(tmp_path), 'v1')
+
+
+def test__needs_reanalysis__tree_only_verdict(tmp_path):
+    added = diff_manifests({'a.py': '1'}, {'a.py': '1', 'b.py': '1'})
+    modified = diff_manifests({'a.py': '1'}, {'a.py': '2'})
+    record = _llm_record(tool_calls=0)
+
+    assert needs_reanalysis(record, 'rule text', 'model', added, str(tmp_path), 'v1')
+    assert not needs_reanalysis(record, 'rule text', 'model', modified, str(tmp_path), 'v1')
+
+
+def test__SnapshotStore__save_and_load(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.save('abc123', {'a.py': '1'}, {'1': {'passed': True}}, 'v1')
+
+    snapshot = store.load('abc123')
+
+    assert snapshot['manifest'] == {'a.py': '1'}
+    assert snapshot['rules'] == {'1': {'passed': True}}
+    assert snapshot['analysis_version'] == 'v1'
+    assert store.load('../abc123') is None
+    assert store.load('missing') is None
+
+
+def test__SnapshotStore__prune_by_ttl_and_count(tmp_path):
+    store = SnapshotStore(str(tmp_path), ttl_seconds=60, max_count=2)
+    now = time.time()
+    for age, snapshot_id in enumerate(['new', 'middle', 'old']):
+        store.save(snapshot_id, {}, {})
+        os.utime(os.path.join(str(tmp_path), f"{snapshot_id}.json"), (now - age * 10, now - age * 10))
+    store.save('expired', {}, {})
+    os.utime(os.path.join(str(tmp_path), 'expired.json'), (now - 120, now - 120))
+
+    assert store.prune() == 2
+    assert sorted(os.listdir(str(tmp_path))) == ['middle.json', 'new.json']
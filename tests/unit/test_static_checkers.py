@@ -0,0 +1,177 @@
+import os
+import zipfile
+
+from app.core.analysis.static_checkers import (
+    AMBIGUOUS,
+    FAILED,
+    PASSED,
+    check_python_file,
+    evaluate_rule,
+    is_test_file,
+    run_static_checks,
+)
+from app.core.utils.snapshot import build_manifest
+from app.core.utils.unzip import archive_root, unzip_file
+
+OPTIONS = {
+    'max_line_length': 80,
+    'max_module_lines': 500,
+    'max_class_lines': 300,
+    'max_function_lines': 5,
+    'required_files': ['.gitignore', '.editorconfig', '.gitattributes'],
+    'required_dirs': ['deployment'],
+}
+
+CLEAN_MODULE = '"""Модуль."""\nimport logging\n\nlogger = logging.getLogger(__name__)\n\n\n' \
+               'def run():\n    """Запуск."""\n    logger.info("ok")\n'
+
+
+def _write(root, relative_path, content=''):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _complete_project(root):
+    for name in ('.gitignore', '.editorconfig', '.gitattributes', '.style.yapf', '.isort.cfg', 'deployment/ci.yml'):
+        _write(root, name)
+    _write(root, 'src/app.py', CLEAN_MODULE)
+    _write(root, 'tests/test_app.py', 'def test__App__runs():\n    assert True\n')
+
+
+def _messages(result, checker):
+    return [finding['message'] for finding in result['findings'][checker]]
+
+
+def test__is_test_file__paths():
+    assert is_test_file('tests/helpers.py')
+    assert is_test_file('src/test_app.py')
+    assert is_test_file('src/app_test.py')
+    assert not is_test_file('src/app.py')
+
+
+def test__check_python_file__clean_module(tmp_path):
+    _write(tmp_path, 'app.py', CLEAN_MODULE)
+
+    result = check_python_file(str(tmp_path), 'app.py', OPTIONS)
+
+    assert result['error'] is None
+    assert all(not findings for findings in result['findings'].values())
+
+
+def test__check_python_file__violations(tmp_path):
+    source = ('import loguru\n\n\n'
+              'class Service:\n'
+              '    def handle(self):\n'
+              '        print("x" * 100, "' + 'y' * 80 + '")\n'
+              '        a = 1\n        b = 2\n        c = 3\n        return a + b + c\n')
+    _write(tmp_path, 'service.py', source)
+
+    result = check_python_file(str(tmp_path), 'service.py', OPTIONS)
+
+    assert _messages(result, 'no_print') == ["Вызов print вместо logging"]
+    assert _messages(result, 'logging_usage') == ["Используется loguru вместо logging"]
+    assert _messages(result, 'size') == ["Функция handle занимает 6 строк (максимум 5)"]
+    assert {f['line'] for f in result['findings']['line_length']} == {6}
+    assert _messages(result, 'docstrings') == [
+        "Модуль без докстринга", "Класс Service без докстринга", "Функция handle без докстринга"
+    ]
+
+
+def test__check_python_file__test_naming(tmp_path):
+    _write(tmp_path, 'tests/test_app.py', 'def test__App__runs():\n    pass\n\n\ndef test_runs():\n    print(1)\n')
+
+    result = check_python_file(str(tmp_path), 'tests/test_app.py', OPTIONS)
+
+    assert [f['line'] for f in result['findings']['test_naming']] == [5]
+    # В тестах print и отсутствие докстрингов допустимы
+    assert not result['findings']['no_print']
+    assert not result['findings']['docstrings']
+
+
+def test__check_python_file__syntax_error(tmp_path):
+    _write(tmp_path, 'broken.py', 'def broken(:\n')
+
+    result = check_python_file(str(tmp_path), 'broken.py', OPTIONS)
+
+    assert result['error'].startswith("Синтаксическая ошибка в строке 1")
+
+
+def test__run_static_checks__complete_project(tmp_path):
+    _complete_project(str(tmp_path))
+
+    results = run_static_checks(str(tmp_path), build_manifest(str(tmp_path)), OPTIONS)
+
+    for name in ('formatter_configs', 'required_files', 'deployment_dir', 'tests_present', 'no_print'):
+        assert results[name]['status'] == PASSED, name
+
+
+def test__run_static_checks__missing_project_files(tmp_path):
+    _write(tmp_path, 'src/app.py', CLEAN_MODULE)
+
+    results = run_static_checks(str(tmp_path), build_manifest(str(tmp_path)), OPTIONS)
+
+    assert [f['path'] for f in results['required_files']['findings']] == OPTIONS['required_files']
+    assert results['formatter_configs']['status'] == FAILED
+    assert results['deployment_dir']['status'] == FAILED
+    assert results['tests_present']['status'] == FAILED
+
+
+def test__run_static_checks__formatter_sections_in_setup_cfg(tmp_path):
+    _complete_project(str(tmp_path))
+    os.remove(os.path.join(str(tmp_path), '.style.yapf'))
+    os.remove(os.path.join(str(tmp_path), '.isort.cfg'))
+    _write(tmp_path, 'setup.cfg', '[yapf]\nbased_on_style = pep8\n\n[isort]\nprofile = black\n')
+
+    results = run_static_checks(str(tmp_path), build_manifest(str(tmp_path)), OPTIONS)
+
+    assert results['formatter_configs']['status'] == PASSED
+
+
+def test__run_static_checks__parse_error_is_ambiguous(tmp_path):
+    _complete_project(str(tmp_path))
+    _write(tmp_path, 'src/broken.py', 'def broken(:\n')
+
+    results = run_static_checks(str(tmp_path), build_manifest(str(tmp_path)), OPTIONS)
+
+    assert results['no_print']['status'] == AMBIGUOUS
+    assert results['line_length']['status'] == PASSED
+
+
+def test__run_static_checks__archive_with_top_level_directory(tmp_path):
+    project = tmp_path / 'source' / 'proj'
+    _complete_project(str(project))
+    zip_path = str(tmp_path / 'proj.zip')
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        for dirpath, _, files in os.walk(str(project)):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                archive.write(path, os.path.relpath(path, str(tmp_path / 'source')))
+    extract_to = str(tmp_path / 'extracted')
+    unzip_file(zip_path, extract_to)
+
+    root = archive_root(extract_to)
+    results = run_static_checks(root, build_manifest(root), OPTIONS)
+
+    assert root == os.path.join(extract_to, 'proj')
+    assert results['required_files']['status'] == PASSED
+    assert results['deployment_dir']['status'] == PASSED
+
+
+def test__evaluate_rule__statuses(tmp_path):
+    static_results = {
+        'no_print': {'status': FAILED, 'findings': [{'path': 'a.py', 'line': None, 'message': "print"}]},
+        'docstrings': {'status': AMBIGUOUS, 'findings': []},
+        'size': {'status': PASSED, 'findings': []},
+    }
+
+    failed = evaluate_rule({'checkers': ['no_print', 'size']}, static_results, str(tmp_path))
+    ambiguous = evaluate_rule({'checkers': ['docstrings', 'size']}, static_results, str(tmp_path))
+
+    assert failed['status'] == FAILED
+    assert failed['findings'] == [{'path': 'a.py', 'line': None, 'message': "print", 'checker': 'no_print'}]
+    assert "a.py  print" in failed['report']
+    assert ambiguous['status'] == AMBIGUOUS and ambiguous['ambiguous']
+    assert ambiguous['report'] is None
+    assert evaluate_rule({'checkers': []}, static_results, str(tmp_path)) is None